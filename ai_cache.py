@@ -0,0 +1,201 @@
+# ai_cache.py — Content-addressed cache for Shaakuni AI answers
+# LRU memory tier + SQLite tier (TTL + size eviction) | optional perceptual hash for charts
+
+import io
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow optional hai — bina iske sirf exact-bytes keys
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+AI_CACHE_MEMORY_ITEMS = int(os.getenv("AI_CACHE_MEMORY_ITEMS", "512"))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))           # seconds
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# "1" karne par same chart ke resized / recompressed copies bhi hit honge
+AI_CACHE_PHASH = os.getenv("AI_CACHE_PHASH", "0") == "1"
+AI_CACHE_PHASH_DISTANCE = 6  # max differing bits (64 mein se) — isse kam = "same chart"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ai_cache (
+        key TEXT PRIMARY KEY,
+        response TEXT,
+        size INTEGER,
+        created_at REAL,
+        last_hit REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ai_cache_last_hit ON ai_cache (last_hit);
+"""
+
+# ---------------- KEYS ----------------
+def normalize_text(text):
+    """Case / extra spaces ka farak key ko na badle."""
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+def dhash(image_bytes, size=8):
+    """64-bit difference hash: resize / JPEG recompression ke baad bhi same rehta hai."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return f"{bits:016x}"
+
+class ResponseCache:
+    """
+    Key = hash(normalized text + image). Pehle memory (LRU) check hoti hai,
+    phir SQLite. SQLite tier attach() ke baad hi active hota hai.
+
+    Perceptual mode mein key "p:<text_hash>:<dhash>" hoti hai; exact miss par
+    same text wale charts mein se sabse nazdeeki dhash (Hamming distance) dhoonda jata hai.
+    """
+
+    def __init__(self, memory_items=AI_CACHE_MEMORY_ITEMS, ttl=AI_CACHE_TTL,
+                 max_bytes=AI_CACHE_MAX_BYTES, use_phash=AI_CACHE_PHASH):
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.use_phash = use_phash and Image is not None
+        self.db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (response, expires_at)
+        self._near = {}               # text_hash -> {dhash_int: key}
+        self._puts_since_evict = 0
+        self._tasks = set()  # background _touch tasks — reference rakho warna GC beech mein mita sakta hai
+
+    async def attach(self, db):
+        """Bot ka Database do — SQLite tier on ho jayega."""
+        self.db = db
+        await db.executescript(SCHEMA)
+        await self.evict()
+        await self._load_near_index()
+
+    async def _load_near_index(self):
+        self._near = {}
+        for row in await self.db.fetchall("SELECT key FROM ai_cache WHERE key LIKE 'p:%'"):
+            self._index_near(row[0])
+
+    async def make_key(self, user_text, image_bytes=None):
+        digest = hashlib.sha256(normalize_text(user_text).encode("utf-8"))
+        if image_bytes:
+            if self.use_phash:
+                try:
+                    phash = await asyncio.to_thread(dhash, image_bytes)
+                    return f"p:{digest.hexdigest()[:32]}:{phash}"
+                except Exception as e:
+                    logger.debug(f"phash failed, using exact bytes: {e}")
+            digest.update(b"\0")
+            digest.update(image_bytes)
+        return digest.hexdigest()
+
+    # ---------------- NEAR-DUPLICATE INDEX ----------------
+    def _index_near(self, key):
+        _, text_hash, phash = key.split(":")
+        self._near.setdefault(text_hash, {})[int(phash, 16)] = key
+
+    def _find_near(self, key):
+        _, text_hash, phash = key.split(":")
+        target = int(phash, 16)
+        best, best_distance = None, AI_CACHE_PHASH_DISTANCE + 1
+        for other, other_key in self._near.get(text_hash, {}).items():
+            distance = bin(target ^ other).count("1")
+            if distance < best_distance:
+                best, best_distance = other_key, distance
+        return best
+
+    # ---------------- GET / PUT ----------------
+    def _remember(self, key, response, expires_at):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    async def get(self, key):
+        now = time.time()
+        if key.startswith("p:") and key not in self._memory:
+            key = self._find_near(key) or key
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self.memory_hits += 1
+                self._memory.move_to_end(key)
+                return entry[0]
+            del self._memory[key]
+
+        if self.db is not None:
+            row = await self.db.fetchone("SELECT response, created_at FROM ai_cache WHERE key=?", (key,))
+            if row is not None and row["created_at"] + self.ttl > now:
+                self.disk_hits += 1
+                self._remember(key, row["response"], row["created_at"] + self.ttl)
+                # last_hit update ka intezaar nahi — answer turant user ko jaye
+                task = asyncio.create_task(self._touch(key, now))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                return row["response"]
+
+        self.misses += 1
+        return None
+
+    async def _touch(self, key, now):
+        try:
+            await self.db.execute("UPDATE ai_cache SET last_hit=? WHERE key=?", (now, key))
+        except Exception as e:
+            logger.debug(f"ai_cache touch failed: {e}")
+
+    async def put(self, key, response):
+        now = time.time()
+        self._remember(key, response, now + self.ttl)
+        if key.startswith("p:"):
+            self._index_near(key)
+        if self.db is None:
+            return
+        await self.db.execute(
+            "INSERT OR REPLACE INTO ai_cache (key, response, size, created_at, last_hit) VALUES (?,?,?,?,?)",
+            (key, response, len(response.encode("utf-8")), now, now),
+        )
+        self._puts_since_evict += 1
+        if self._puts_since_evict >= 50:
+            await self.evict()
+
+    async def evict(self):
+        """Expired entries hatao, phir total size limit ke upar ho to least-recently-hit se hatao."""
+        self._puts_since_evict = 0
+        if self.db is None:
+            return
+        await self.db.execute("DELETE FROM ai_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        total = await self.db.fetchval("SELECT COALESCE(SUM(size), 0) FROM ai_cache")
+        if total <= self.max_bytes:
+            return
+        # Running total (oldest last_hit pehle) — jab tak excess cover na ho, utni rows delete
+        removed = await self.db.execute("""
+            DELETE FROM ai_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, size, SUM(size) OVER (ORDER BY last_hit, key) AS running FROM ai_cache
+                ) WHERE running - size < ?
+            )
+        """, (total - self.max_bytes,))
+        logger.info(f"ai_cache evicted {removed} entries (size limit)")
+        await self._load_near_index()
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (hits / total * 100) if total else 0.0,
+        }
@@ -0,0 +1,139 @@
+# ai_scheduler.py — Admission control in front of the Gemini calls
+# Global concurrency cap | per-user limit | bounded FIFO queue | jittered retry on quota errors
+
+import os
+import random
+import asyncio
+import logging
+from collections import deque, Counter
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+AI_MAX_CONCURRENT = int(os.getenv("AI_MAX_CONCURRENT", "4"))  # ek saath kitni Gemini calls
+AI_PER_USER = int(os.getenv("AI_PER_USER", "1"))              # ek user ke kitne requests (queued + running)
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "50"))           # isse zyada wait karne wale = reject
+
+class QueueFull(Exception):
+    """Queue bhari hai — user ko baad mein try karne ko bolo."""
+
+class UserBusy(Exception):
+    """Is user ka pichla request abhi chal raha hai."""
+
+class _Ticket:
+    __slots__ = ("future", "on_position", "position")
+
+    def __init__(self, future, on_position):
+        self.future = future
+        self.on_position = on_position
+        self.position = None
+
+class AIScheduler:
+    """
+    submit() job ko slot milne tak FIFO queue mein rakhta hai. Queue mein
+    position badalne par on_position(pos) callback chalta hai (UI update ke liye).
+    retry_on wale exceptions par job jittered exponential backoff ke saath dobara chalti hai.
+    """
+
+    def __init__(self, max_concurrent=AI_MAX_CONCURRENT, per_user=AI_PER_USER, max_queue=AI_MAX_QUEUE,
+                 retry_on=(), max_retries=3, base_delay=2.0):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.retry_on = tuple(retry_on)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.running = 0
+        self.rejected = 0
+        self.retries = 0
+        self._waiting = deque()
+        self._per_user = Counter()
+        self._callbacks = set()
+
+    @property
+    def queued(self):
+        return len(self._waiting)
+
+    async def submit(self, user_id, job, on_position=None):
+        """job = async callable bina arguments ke. Uska result return hota hai."""
+        if self._per_user[user_id] >= self.per_user:
+            self.rejected += 1
+            raise UserBusy()
+        if len(self._waiting) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull()
+
+        self._per_user[user_id] += 1
+        try:
+            await self._acquire(on_position)
+            try:
+                return await self._run_with_retry(job)
+            finally:
+                self._release()
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+
+    # ---------------- SLOTS ----------------
+    async def _acquire(self, on_position):
+        if self.running < self.max_concurrent and not self._waiting:
+            self.running += 1
+            return
+        ticket = _Ticket(asyncio.get_running_loop().create_future(), on_position)
+        self._waiting.append(ticket)
+        self._notify_positions()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._notify_positions()
+            elif ticket.future.done() and not ticket.future.cancelled():
+                # Slot mil chuka tha par hum cancel ho gaye — slot wapas do
+                self._release()
+            raise
+
+    def _release(self):
+        self.running -= 1
+        while self._waiting and self.running < self.max_concurrent:
+            ticket = self._waiting.popleft()
+            if not ticket.future.done():
+                self.running += 1
+                ticket.future.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for position, ticket in enumerate(self._waiting, start=1):
+            if ticket.on_position is None or ticket.position == position:
+                continue
+            ticket.position = position
+            task = asyncio.create_task(self._safe_callback(ticket.on_position, position))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    @staticmethod
+    async def _safe_callback(callback, position):
+        try:
+            await callback(position)
+        except Exception as e:
+            logger.debug(f"Queue position update failed: {e}")
+
+    # ---------------- RETRY ----------------
+    async def _run_with_retry(self, job):
+        attempt = 0
+        while True:
+            try:
+                return await job()
+            except self.retry_on as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Exponential backoff + jitter, taaki saare retries ek saath na lagein
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"AI quota/busy error, retry {attempt}/{self.max_retries} in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        return {"running": self.running, "queued": len(self._waiting), "rejected": self.rejected, "retries": self.retries}
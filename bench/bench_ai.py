@@ -0,0 +1,42 @@
+# bench/bench_ai.py — Gemini prompt token cost per call, offline (fake model)
+# Usage: python bench/bench_ai.py --questions 50
+
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_gemini import FakeModel, count_tokens
+
+async def run(n):
+    import ssm_ai
+    questions = [f"Kya ye setup #{i} valid hai? IDM liya ya nahi?" for i in range(n)]
+    asked = questions + questions[: n // 2]  # aadhe sawaal repeat hote hain
+
+    # Purana tareeka: SYSTEM_PROMPT har request ke contents mein, koi cache nahi
+    legacy_prompt = sum(count_tokens([ssm_ai.SYSTEM_PROMPT, f"Student Question: {q}"]) for q in asked)
+    print(f"{'mode':28} {'asked':>6} {'calls':>6} {'prompt tok/call':>16} {'cached tok/call':>16}")
+    print(f"{'legacy (prompt in contents)':28} {len(asked):>6} {len(asked):>6} {legacy_prompt / len(asked):>16.0f} {0:>16}")
+
+    for label, fake in (
+        ("system_instruction", FakeModel(latency=0, system_instruction=ssm_ai.SYSTEM_PROMPT)),
+        ("context cache", FakeModel(latency=0, cached_context=ssm_ai.SYSTEM_PROMPT)),
+    ):
+        ssm_ai.set_model(fake)
+        ssm_ai.response_cache = type(ssm_ai.response_cache)()  # har run fresh answer cache
+        for key in ssm_ai.usage_stats: ssm_ai.usage_stats[key] = 0
+        for q in asked:
+            await ssm_ai.analyze_ssm_request(q)
+        stats = ssm_ai.usage_stats
+        print(f"{label:28} {len(asked):>6} {fake.calls:>6} "
+              f"{stats['prompt_tokens'] / fake.calls:>16.0f} {stats['cached_tokens'] / fake.calls:>16.0f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.questions))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# bench/bench_bot.py — End-to-end load test of the real bot Application, fully offline
+# Fake Telegram API + stub XM/Vantage servers + fake Gemini | p50/p95/p99 per handler
+# Updates app.update_queue se PerUserUpdateProcessor tak (asli dispatch path), outbound rate limiter default on
+# Usage: python bench/bench_bot.py --users 200 --concurrency 50 --tg-latency 0.05 --broker-latency 0.2 --ai-latency 1.5
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import itertools
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_brokers import run_stub_server
+from fake_gemini import FakeModel
+from fake_telegram import FakeTelegramRequest, BOT_USER, make_chart_png
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+# ---------------- SYNTHETIC UPDATES ----------------
+def _user(uid):
+    return {"id": uid, "is_bot": False, "first_name": f"Trader{uid}", "username": f"trader{uid}"}
+
+def _message(uid, **fields):
+    message = {"message_id": next(_message_ids), "date": int(time.time()),
+               "chat": {"id": uid, "type": "private"}, "from": _user(uid)}
+    message.update(fields)
+    return {"update_id": next(_update_ids), "message": message}
+
+def text_update(uid, text):
+    fields = {"text": text}
+    if text.startswith("/"):
+        fields["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return _message(uid, **fields)
+
+def photo_update(uid, caption):
+    sizes = [(320, 180), (800, 450), (1280, 720), (1600, 900)]
+    photo = [{"file_id": f"chart{uid}_{w}", "file_unique_id": f"c{uid}{w}", "width": w, "height": h, "file_size": w * h // 10}
+             for w, h in sizes]
+    return _message(uid, photo=photo, caption=caption)
+
+def callback_update(uid, data):
+    return {"update_id": next(_update_ids), "callback_query": {
+        "id": str(next(_update_ids)), "from": _user(uid), "chat_instance": str(uid), "data": data,
+        "message": {"message_id": next(_message_ids), "date": int(time.time()),
+                    "chat": {"id": uid, "type": "private"}, "from": BOT_USER, "text": "Select your Broker"},
+    }}
+
+def scenario(uid, invalid_every):
+    """Ek user ka flow: (handler label, update dict). Har invalid_every-th user galat ID deta hai."""
+    broker = "XM" if uid % 2 else "Vantage"
+    valid = not invalid_every or uid % invalid_every
+    client_id = str(1000 + uid % 1000) if valid else str(900000 + uid)
+    steps = [
+        ("start", text_update(uid, "/start")),
+        ("broker_choice", callback_update(uid, f"broker:{broker}")),
+        ("client_id", text_update(uid, client_id)),
+    ]
+    if valid:
+        steps += [
+            ("ai_text", text_update(uid, f"Trader {uid}: kya ye sweep ke baad IDM valid hai?")),
+            ("ai_photo", photo_update(uid, f"Chart #{uid} — entry sahi hai?")),
+        ]
+    return steps
+
+# ---------------- RUN ----------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run(args):
+    from telegram import Update
+    import bot
+    import ssm_ai
+    logging.getLogger().setLevel(logging.WARNING)  # har request ka INFO log timings bigaadta hai
+
+    request = FakeTelegramRequest(latency=args.tg_latency, file_bytes=make_chart_png())
+    app = bot.build_application(token="123456:BENCH", request=request,
+                                rate_limiter=bot.outbox if args.rate_limit else None)
+    ssm_ai.set_model(FakeModel(latency=args.ai_latency, system_instruction=ssm_ai.SYSTEM_PROMPT))
+
+    timings = defaultdict(list)
+    errors = []
+    limit = asyncio.Semaphore(args.concurrency)
+
+    # Completion hook: update processor (per-user lock + UPDATE_CONCURRENCY) se guzar kar poora hone pe
+    finished = {}  # update_id -> Future
+    processor = app.update_processor
+    process = processor.do_process_update
+
+    async def timed_process(update, coroutine):
+        try:
+            await process(update, coroutine)
+        finally:
+            waiter = finished.pop(update.update_id, None)
+            if waiter is not None:
+                waiter.set_result(time.perf_counter())
+
+    processor.do_process_update = timed_process
+
+    async def record_error(update, context):
+        errors.append(f"{type(update).__name__}: {context.error!r}")
+
+    app.add_error_handler(record_error)
+
+    await app.initialize()
+    await app.post_init(app)  # init_db bhi yahin (on_startup)
+    await app.start()         # update fetcher + job queue, jaise production mein
+
+    async def one_user(uid):
+        async with limit:
+            for label, data in scenario(uid, args.invalid_every):
+                update = Update.de_json(data, app.bot)
+                done = finished[update.update_id] = asyncio.get_running_loop().create_future()
+                started = time.perf_counter()
+                await app.update_queue.put(update)
+                timings[label].append(await done - started)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one_user(100_000 + i) for i in range(args.users)))
+    finally:
+        elapsed = time.perf_counter() - started
+        await app.stop()
+        await app.shutdown()
+        await app.post_shutdown(app)
+
+    total = sum(len(v) for v in timings.values())
+    print(f"{args.users} users, {total} updates in {elapsed:.2f}s -> {total / elapsed:.1f} updates/s "
+          f"(concurrency {args.concurrency}, update processor max {processor.max_concurrent_updates}, "
+          f"rate limiter {'on' if args.rate_limit else 'off'})")
+    print(f"{'handler':14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for label in ("start", "broker_choice", "client_id", "ai_text", "ai_photo"):
+        values = sorted(timings.get(label, []))
+        if values:
+            print(f"{label:14} {len(values):>6} {percentile(values, 50) * 1000:>9.0f} {percentile(values, 95) * 1000:>9.0f} "
+                  f"{percentile(values, 99) * 1000:>9.0f} {values[-1] * 1000:>9.0f}")
+    print(f"Telegram calls: {sum(request.calls.values())} {dict(request.calls.most_common(6))}")
+    print(f"AI scheduler: {bot.ai_scheduler.stats()} | AI cache: {ssm_ai.response_cache.stats()}")
+    if args.rate_limit:
+        print(f"Outbox: {bot.outbox.stats()}")
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="ek saath active users")
+    parser.add_argument("--tg-latency", type=float, default=0.05, help="fake Telegram latency per call (s)")
+    parser.add_argument("--broker-latency", type=float, default=0.2, help="stub XM/Vantage latency per call (s)")
+    parser.add_argument("--ai-latency", type=float, default=1.5, help="fake Gemini latency per answer (s)")
+    parser.add_argument("--invalid-every", type=int, default=5, help="har N-th user galat client ID (0 = koi nahi)")
+    parser.add_argument("--rate-limit", action=argparse.BooleanOptionalAction, default=True,
+                        help="asli outbound rate limiter (--no-rate-limit: Telegram flood limits ke bina)")
+    args = parser.parse_args()
+
+    server, url = run_stub_server(latency=args.broker_latency)
+    workdir = tempfile.TemporaryDirectory()
+    # bot / brokers config import-time pe padhte hain, isliye import se pehle set karo
+    os.environ.update({
+        "XM_API_URL": url, "VANTAGE_API_URL": url,
+        "XM_TOKEN": "bench", "VANTAGE_USER_ID": "1", "VANTAGE_SECRET": "bench",
+        "VIP_CHANNEL_ID": "-1001234567890",
+        "DB_PATH": os.path.join(workdir.name, "bench.db"),
+    })
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+        workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
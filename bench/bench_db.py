@@ -0,0 +1,88 @@
+# bench/bench_db.py — Query throughput: connection-per-call vs managed Database
+# Usage: python bench/bench_db.py --rows 50000 --ops 2000
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database
+
+SCHEMA = """
+    CREATE TABLE users (tg_user_id INTEGER PRIMARY KEY, username TEXT, joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, tg_user_id INTEGER, broker TEXT, client_id TEXT,
+        status TEXT, last_trade_date TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+INDEXES = """
+    CREATE INDEX idx_submissions_user_status ON submissions (tg_user_id, status);
+    CREATE INDEX idx_submissions_client_broker ON submissions (client_id, broker);
+"""
+GATE_SQL = "SELECT 1 FROM submissions WHERE tg_user_id=? AND status='approved' LIMIT 1"
+USER_SQL = "INSERT OR IGNORE INTO users (tg_user_id, username) VALUES (?,?)"
+
+def seed(path, rows, indexed):
+    import sqlite3
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA + (INDEXES if indexed else ""))
+    con.executemany(
+        "INSERT INTO submissions (tg_user_id, broker, client_id, status, last_trade_date) VALUES (?,?,?,?,?)",
+        ((i, random.choice(("XM", "Vantage")), str(100000 + i), "approved", "2024-01-01") for i in range(rows)),
+    )
+    con.commit()
+    con.close()
+
+def workload(rows, ops):
+    # 90% AI-gate reads, 10% /start user inserts (real traffic jaisa mix)
+    rng = random.Random(7)
+    return [("w" if rng.random() < 0.1 else "r", rng.randrange(rows * 2)) for _ in range(ops)]
+
+async def run_before(path, jobs):
+    # Purana pattern: har query ke liye naya aiosqlite connection (aur naya thread)
+    async def one(kind, uid):
+        async with aiosqlite.connect(path) as db:
+            if kind == "r":
+                async with db.execute(GATE_SQL, (uid,)) as cursor:
+                    await cursor.fetchone()
+            else:
+                await db.execute(USER_SQL, (uid, f"user{uid}"))
+                await db.commit()
+    await asyncio.gather(*(one(k, u) for k, u in jobs))
+
+async def run_after(path, jobs):
+    db = await Database(path).open()
+    async def one(kind, uid):
+        if kind == "r":
+            await db.fetchone(GATE_SQL, (uid,))
+        else:
+            await db.execute(USER_SQL, (uid, f"user{uid}"))
+    try:
+        await asyncio.gather(*(one(k, u) for k, u in jobs))
+    finally:
+        await db.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+    jobs = workload(args.rows, args.ops)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, runner, indexed in (("before", run_before, False), ("after", run_after, True)):
+            path = os.path.join(tmp, f"{label}.db")
+            seed(path, args.rows, indexed)
+            start = time.perf_counter()
+            asyncio.run(runner(path, jobs))
+            elapsed = time.perf_counter() - start
+            print(f"{label:7} {args.ops} queries in {elapsed:.2f}s -> {args.ops / elapsed:.0f} q/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench/bench_outbox.py — OutboundDispatcher checks against the fake Telegram API
+# Edit coalescing | owner cancel ke baad merged edit | RetryAfter (429) retry | flood isolation — offline, exit code 1 on failure
+# Usage: python bench/bench_outbox.py --edits 30
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_telegram import FakeTelegramRequest
+
+CHAT = 4242
+
+async def make_bot(**fake):
+    from telegram.ext import ExtBot
+    from outbox import OutboundDispatcher
+    request = FakeTelegramRequest(latency=0.01, **fake)
+    dispatcher = OutboundDispatcher()
+    bot = ExtBot("123456:BENCH", request=request, get_updates_request=request, rate_limiter=dispatcher)
+    await bot.initialize()
+    return bot, request, dispatcher
+
+async def coalescing(n):
+    """n tez edits ek hi message pe: Telegram tak kam calls, aakhri text hi dikhe, sab callers ko result."""
+    bot, request, dispatcher = await make_bot()
+    tasks = []
+    for i in range(n):
+        tasks.append(asyncio.create_task(bot.edit_message_text(f"text {i}", chat_id=CHAT, message_id=1)))
+        await asyncio.sleep(0.02)
+    results = await asyncio.gather(*tasks)
+    await bot.shutdown()
+    calls = request.calls["editMessageText"]
+    ok = calls < n and request.last["editMessageText"]["text"] == f"text {n - 1}" and all(results)
+    return ok, f"{n} edits -> {calls} API calls, {dispatcher.coalesced} coalesced, last={request.last['editMessageText']['text']!r}"
+
+async def owner_cancelled():
+    """Token ka wait kar raha owner cancel ho: merged caller ka naya text phir bhi jaaye, use CancelledError nahi."""
+    bot, request, dispatcher = await make_bot()
+    for _ in range(3):   # private chat ka burst khatam
+        await bot.send_message(CHAT, "burst")
+    owner = asyncio.create_task(bot.edit_message_text("x", chat_id=CHAT, message_id=7))
+    await asyncio.sleep(0.05)
+    merged = asyncio.create_task(bot.edit_message_text("y", chat_id=CHAT, message_id=7))
+    await asyncio.sleep(0.05)
+    owner.cancel()
+    try:
+        await asyncio.wait_for(merged, timeout=5)
+        outcome = "merged caller got result"
+        ok = request.last.get("editMessageText", {}).get("text") == "y"
+    except asyncio.CancelledError:
+        outcome, ok = "merged caller raised CancelledError", False
+    except asyncio.TimeoutError:
+        outcome, ok = "merged caller hung", False
+    await bot.shutdown()
+    return ok, f"{outcome}, sent text={request.last.get('editMessageText', {}).get('text')!r}"
+
+async def retry_after(n):
+    """Har 4th call 429: saare sends retry ke baad pahunchein."""
+    bot, request, dispatcher = await make_bot(flood_every=4, flood_retry_after=1)
+    results = await asyncio.gather(*(bot.send_message(CHAT + i, f"msg {i}") for i in range(n)), return_exceptions=True)
+    await bot.shutdown()
+    failed = [r for r in results if isinstance(r, Exception)]
+    ok = not failed and request.calls["sendMessage"] == n and dispatcher.retries == request.floods
+    return ok, f"{n} sends, {request.floods} x 429, {dispatcher.retries} retries, {len(failed)} failed"
+
+async def channel_flood():
+    """Channel pe ban ka 429 sirf us channel ko roke — private chat ka message turant jaaye."""
+    bot, request, dispatcher = await make_bot(flood_once=("banChatMember",), flood_retry_after=2)
+    ban = asyncio.create_task(bot.ban_chat_member(-100123, 555))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await bot.send_message(42, "hi")
+    waited = time.perf_counter() - started
+    await ban
+    banned = time.perf_counter() - started
+    await bot.shutdown()
+    return waited < 0.5 and banned > 1.5, f"private send waited {waited:.2f}s, channel ban retried after {banned:.2f}s"
+
+async def chat_action():
+    """Typing indicators chat ka message burst na khayein."""
+    bot, request, dispatcher = await make_bot()
+    started = time.perf_counter()
+    for _ in range(5):
+        await bot.send_chat_action(CHAT, "typing")
+    for _ in range(3):
+        await bot.send_message(CHAT, "burst")
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    return elapsed < 0.5, f"5 chat actions + 3 messages in {elapsed:.2f}s"
+
+async def run(args):
+    checks = [
+        ("coalescing", await coalescing(args.edits)),
+        ("owner cancel", await owner_cancelled()),
+        ("RetryAfter", await retry_after(args.sends)),
+        ("flood scope", await channel_flood()),
+        ("chat action", await chat_action()),
+    ]
+    for name, (ok, detail) in checks:
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<13} {detail}")
+    return all(ok for _, (ok, _) in checks)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edits", type=int, default=30)
+    parser.add_argument("--sends", type=int, default=12)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench/bench_reverify.py — Bulk re-verification vs one broker call per approved account
+# Usage: python bench/bench_reverify.py --accounts 5000 --latency 0.05
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_brokers import run_stub_server
+
+async def run(n, db_path):
+    import brokers
+    from database import Database, VerifiedUserCache
+    from jobs import Reverifier
+
+    db = Database(db_path)
+    await db.open()
+    await db.executescript("""
+        CREATE TABLE submissions (id INTEGER PRIMARY KEY AUTOINCREMENT, tg_user_id INTEGER, broker TEXT,
+            client_id TEXT, status TEXT, last_trade_date TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    """)
+    await brokers.vantage_index.load(db)  # sync_state table
+    accounts = [str(100000 + i) for i in range(n)]
+    await db.executemany(
+        "INSERT INTO submissions (tg_user_id, broker, client_id, status, last_trade_date) VALUES (?,?,?, 'approved', '2000-01-01')",
+        [(i, "XM" if i % 2 else "Vantage", acc) for i, acc in enumerate(accounts)],
+    )
+    await brokers.open_http_client()
+    try:
+        # Purana tareeka: har approved XM account ke liye ek GET
+        xm_ids = accounts[1::2]
+        started = time.perf_counter()
+        await asyncio.gather(*(brokers.lookup_xm_user(cid) for cid in xm_ids))
+        per_user = time.perf_counter() - started
+        print(f"per-user XM checks : {len(xm_ids):>6} calls in {per_user:.2f}s (aur last_trade_date phir bhi pata nahi)")
+
+        reverifier = Reverifier(db, VerifiedUserCache(db))
+        for broker in ("XM", "Vantage"):
+            started = time.perf_counter()
+            updated = await reverifier.reverify(broker)
+            print(f"bulk {broker:<8}      : {updated:>6} rows updated in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        updated = await reverifier.reverify("XM")
+        print(f"bulk XM (2nd run)  : {updated:>6} rows updated in {time.perf_counter() - started:.2f}s (incremental window)")
+    finally:
+        await brokers.close_http_client()
+        await db.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per call (s)")
+    args = parser.parse_args()
+
+    server, url = run_stub_server(latency=args.latency, accounts=[str(100000 + i) for i in range(args.accounts)])
+    os.environ.update({
+        "XM_API_URL": url, "VANTAGE_API_URL": url,
+        "XM_TOKEN": "bench", "VANTAGE_USER_ID": "1", "VANTAGE_SECRET": "bench",
+    })
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            asyncio.run(run(args.accounts, os.path.join(workdir, "bench.db")))
+        finally:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
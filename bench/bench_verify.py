@@ -0,0 +1,65 @@
+# bench/bench_verify.py — Concurrent broker verification throughput
+# Usage: python bench/bench_verify.py --requests 200 --latency 0.1
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_brokers import run_stub_server
+
+async def run(n, broker):
+    import brokers
+    await brokers.open_http_client()
+    verify = brokers.lookup_xm_user if broker == "XM" else brokers.lookup_vantage_user  # raw, bina gate
+    ids = [str(1000 + (i * 37) % 1500) for i in range(n)]  # ~1/3 IDs unknown
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(verify(cid) for cid in ids))
+        elapsed = time.perf_counter() - start
+    finally:
+        await brokers.close_http_client()
+    return elapsed, sum(results)
+
+async def run_gate(n, broker, distinct=20):
+    """Retry storm: n attempts, sirf `distinct` alag IDs (users wahi galat / sahi ID baar-baar bhejte hain)."""
+    import brokers
+    await brokers.open_http_client()
+    gate = brokers.VerificationGate(user_limit=n)
+    ids = [str(1000 + (i % distinct) * 97) for i in range(n)]
+    try:
+        start = time.perf_counter()
+        first = await asyncio.gather(*(gate.verify(broker, cid, user_id=i) for i, cid in enumerate(ids)))
+        await asyncio.gather(*(gate.verify(broker, cid, user_id=i) for i, cid in enumerate(ids)))  # /start retry
+        elapsed = time.perf_counter() - start
+    finally:
+        await brokers.close_http_client()
+    return elapsed, sum(first), gate.stats()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per call (s)")
+    args = parser.parse_args()
+
+    server, url = run_stub_server(latency=args.latency)
+    # brokers.py env import-time pe padhta hai, isliye import se pehle set karo
+    os.environ.update({
+        "XM_API_URL": url, "VANTAGE_API_URL": url,
+        "XM_TOKEN": "bench", "VANTAGE_USER_ID": "1", "VANTAGE_SECRET": "bench",
+    })
+    try:
+        for broker in ("XM", "Vantage"):
+            elapsed, ok = asyncio.run(run(args.requests, broker))
+            print(f"{broker:8} {args.requests} checks in {elapsed:.2f}s "
+                  f"-> {args.requests / elapsed:.1f} req/s ({ok} valid)")
+        elapsed, ok, stats = asyncio.run(run_gate(args.requests, "XM"))
+        print(f"XM gate  {2 * args.requests} checks (20 distinct IDs) in {elapsed:.2f}s -> "
+              f"{stats['broker_calls']} broker calls, {stats['merged']} merged, {stats['cache_hits']} cached")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
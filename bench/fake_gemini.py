@@ -0,0 +1,73 @@
+# bench/fake_gemini.py — Offline stand-in for google.generativeai.GenerativeModel
+# Token counts approximate hain (~4 chars/token, 258 tokens per image — Gemini jaisa)
+
+import asyncio
+
+IMAGE_TOKENS = 258
+
+def count_tokens(contents):
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, dict):
+        return IMAGE_TOKENS if "data" in contents else count_tokens(contents.get("text"))
+    return sum(count_tokens(part) for part in contents)
+
+class FakeUsage:
+    def __init__(self, prompt, cached, output):
+        self.prompt_token_count = prompt
+        self.cached_content_token_count = cached
+        self.candidates_token_count = output
+
+class FakeResponse:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeStream:
+    """stream=True ka response: async iteration ke baad usage_metadata milta hai (real SDK jaisa)."""
+
+    def __init__(self, chunks, delay, usage):
+        self._chunks = chunks
+        self._delay = delay
+        self.usage_metadata = usage
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield FakeChunk(chunk)
+
+class FakeModel:
+    """
+    generate_content_async ka fake. system_instruction har call ke prompt tokens
+    mein count hota hai (real API jaisa); cached_context alag "cached" tokens mein.
+    stream=True par answer chunk_size ke tukdon mein, latency unke beech bant jaati hai.
+    """
+
+    def __init__(self, latency=0.5, system_instruction=None, cached_context=None,
+                 answer="**Status:** ✅ Valid\n**Score:** 80%\n**Analysis:** Sweep + IDM taken.",
+                 chunk_size=40):
+        self.latency = latency
+        self.system_instruction = system_instruction
+        self.cached_context = cached_context
+        self.answer = answer
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.bytes_sent = 0
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        self.bytes_sent += sum(len(p) if isinstance(p, str) else len(p.get("data", b"")) for p in contents)
+        cached = count_tokens(self.cached_context)
+        prompt = count_tokens(contents) + count_tokens(self.system_instruction) + cached
+        usage = FakeUsage(prompt, cached, count_tokens(self.answer))
+        if stream:
+            chunks = [self.answer[i:i + self.chunk_size] for i in range(0, len(self.answer), self.chunk_size)]
+            return FakeStream(chunks, self.latency / max(len(chunks), 1), usage)
+        await asyncio.sleep(self.latency)
+        return FakeResponse(self.answer, usage)
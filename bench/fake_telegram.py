@@ -0,0 +1,115 @@
+# bench/fake_telegram.py — Offline stand-in for the Telegram Bot API (PTB BaseRequest)
+# Har endpoint ka plausible JSON jawab, configurable latency, file downloads ke liye chart image
+
+import io
+import json
+import time
+import asyncio
+import itertools
+from collections import Counter
+
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 777000, "is_bot": True, "first_name": "Maharaja", "username": "maharaja_bench_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+def make_chart_png(width=1600, height=900):
+    """Candles jaisi lines wali PNG — prepare_chart ko asli decode/resize karna pade."""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    price = height // 2
+    for x in range(20, width - 20, 12):
+        move = ((x * 7919) % 61) - 30
+        top, bottom = sorted((price, price + move))
+        draw.line((x + 4, top - 15, x + 4, bottom + 15), fill="black")
+        draw.rectangle((x, top, x + 8, bottom), fill="green" if move > 0 else "red")
+        price = min(max(price + move // 2, 100), height - 100)
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+class FakeTelegramRequest(BaseRequest):
+    """
+    Application.builder().request(...) mein lagta hai. Network nahi — har call
+    latency ke baad {"ok": true, "result": ...} deti hai. calls mein endpoint-wise ginti,
+    last mein har endpoint ke aakhri params. flood_every=N: har N-th API call 429
+    (retry_after=flood_retry_after) — PTB ise RetryAfter bana kar raise karta hai.
+    flood_once: in endpoints ki pehli call 429 (ek endpoint ka flood baaki pe asar dekhne ke liye).
+    """
+
+    def __init__(self, latency=0.05, file_bytes=None, flood_every=0, flood_retry_after=1, flood_once=()):
+        self.latency = latency
+        self.file_bytes = file_bytes
+        self.flood_every = flood_every
+        self.flood_retry_after = flood_retry_after
+        self.flood_once = set(flood_once)
+        self.calls = Counter()
+        self.floods = 0
+        self.last = {}
+        self._message_ids = itertools.count(10_000)
+        self._api_calls = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, params, **extra):
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": params.get("message_id") or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if isinstance(chat_id, int) and chat_id > 0 else "channel"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        message.update(extra)
+        return message
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return BOT_USER
+        if endpoint in ("sendMessage", "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "copyMessage"):
+            return self._message(params)
+        if endpoint == "sendDocument":
+            return self._message(params, document={"file_id": "doc", "file_unique_id": "doc"})
+        if endpoint == "getFile":
+            return {"file_id": params["file_id"], "file_unique_id": params["file_id"],
+                    "file_size": len(self.file_bytes or b""), "file_path": f"photos/{params['file_id']}.png"}
+        if endpoint == "createChatInviteLink":
+            return {"invite_link": f"https://t.me/+bench{next(self._message_ids)}", "creator": BOT_USER,
+                    "creates_join_request": False, "is_primary": False, "is_revoked": False,
+                    "member_limit": params.get("member_limit"), "name": params.get("name")}
+        if endpoint == "revokeChatInviteLink":
+            return {"invite_link": params["invite_link"], "creator": BOT_USER,
+                    "creates_join_request": False, "is_primary": False, "is_revoked": True}
+        return True  # answerCallbackQuery, sendChatAction, setMyCommands, banChatMember, ...
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if "/file/bot" in url:
+            self.calls["download"] += 1
+            return 200, self.file_bytes or b""
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        flood = self.flood_every and next(self._api_calls) % self.flood_every == 0
+        if flood or endpoint in self.flood_once:
+            self.flood_once.discard(endpoint)
+            self.floods += 1
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests: retry later",
+                    "parameters": {"retry_after": self.flood_retry_after}}
+            return 429, json.dumps(body).encode("utf-8")
+        self.calls[endpoint] += 1
+        self.last[endpoint] = params
+        body = {"ok": True, "result": self._result(endpoint, params)}
+        return 200, json.dumps(body).encode("utf-8")
@@ -0,0 +1,100 @@
+# bench/stub_brokers.py — Local fake XM + Vantage IB APIs (testing / benchmarks)
+# Usage: python bench/stub_brokers.py --port 8765 --latency 0.2
+
+import json
+import time
+import argparse
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Registered accounts: in IDs ko dono brokers "valid" maanenge
+KNOWN_ACCOUNTS = {str(n) for n in range(1000, 2000)}
+
+def last_trade(account):
+    """Har account ka fixed last trade date: aaj se 0-39 din pehle."""
+    return datetime.date.today() - datetime.timedelta(days=int(account) % 40)
+
+class StubBrokerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, taaki client ka pool reuse ho
+    latency = 0.0
+    accounts = KNOWN_ACCOUNTS
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        # XM: GET /api/traders/<client_id>, GET /api/traders/activity?from=&page=&pageSize=
+        time.sleep(self.latency)
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts == ["api", "traders", "activity"]:
+            query = parse_qs(url.query)
+            since = datetime.date.fromisoformat(query["from"][0])
+            page, size = int(query.get("page", ["1"])[0]), int(query.get("pageSize", ["1000"])[0])
+            active = [a for a in sorted(self.accounts) if last_trade(a) >= since]
+            rows = [{"traderId": a, "lastTradeDate": last_trade(a).isoformat()} for a in active[(page - 1) * size:page * size]]
+            self._reply(200, {"data": rows, "nextPage": page + 1 if page * size < len(active) else None})
+            return
+        if len(parts) == 3 and parts[:2] == ["api", "traders"]:
+            if parts[2] in self.accounts:
+                self._reply(200, {"traderId": parts[2]})
+            else:
+                self._reply(404, {"error": "not found"})
+            return
+        self._reply(404, {"error": "unknown endpoint"})
+
+    def do_POST(self):
+        # Vantage: POST /api/ibData/accountData
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(self.latency)
+        if self.path.rstrip("/") == "/api/ibData/accountData":
+            data = [{"account": int(a)} for a in sorted(self.accounts)]
+            self._reply(200, {"code": 1, "data": data})
+            return
+        # Vantage: POST /api/ibData/tradeData — har account ke 2 trades (latest = last_trade)
+        if self.path.rstrip("/") == "/api/ibData/tradeData":
+            data = []
+            for a in sorted(self.accounts):
+                for days_before in (3, 0):
+                    closed = last_trade(a) - datetime.timedelta(days=days_before)
+                    data.append({"account": int(a), "closeTime": f"{closed.isoformat()} 12:00:00"})
+            self._reply(200, {"code": 1, "data": data})
+            return
+        self._reply(404, {"error": "unknown endpoint"})
+
+def run_stub_server(port=0, latency=0.0, accounts=None):
+    """
+    Background thread mein stub server start karta hai.
+    Returns (server, base_url) — band karne ke liye server.shutdown().
+    """
+    handler = type("Handler", (StubBrokerHandler,), {
+        "latency": latency,
+        "accounts": set(accounts) if accounts is not None else KNOWN_ACCOUNTS,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake XM / Vantage IB API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+    server, url = run_stub_server(args.port, args.latency)
+    print(f"✅ Stub brokers running at {url} (XM_API_URL / VANTAGE_API_URL)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
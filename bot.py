@@ -6,14 +6,17 @@ import time
 import asyncio
 import logging
 import threading
-import aiosqlite
-import requests
 import datetime
 import pytz
 import csv
-from io import BytesIO, StringIO
+import gzip
+import tempfile
+from io import BytesIO, TextIOWrapper
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
+# Cold start timing yahin se — neeche ke imports (telegram, handlers) bhi gine jaate hain
+BOOT_STARTED = time.perf_counter()
+
 from telegram import (
     Update,
     InlineKeyboardButton,
@@ -35,7 +38,27 @@ from telegram.ext import (
 from telegram.error import BadRequest, Forbidden
 
 # --- IMPORT AI MODULE ---
-from ssm_ai import analyze_ssm_request
+# (Gemini SDK ssm_ai ke andar pehli zaroorat / prewarm pe import hota hai)
+from ssm_ai import analyze_ssm_request, stream_ssm_request, response_cache, usage_stats, AIBusyError, AI_PREWARM
+from ssm_ai import prewarm as prewarm_ai
+from live_reply import LiveReply
+from outbox import OutboundDispatcher
+from webhook import WEBHOOK_URL, PerUserUpdateProcessor, run_webhook
+import metrics
+from metrics import CallbackMetric, StartupTimer, VERIFICATIONS, APPROVALS
+from ai_scheduler import AIScheduler, QueueFull, UserBusy
+from chart_images import pick_photo_size, prepare_chart
+# --- IMPORT DATABASE MODULE ---
+from database import Database, VerifiedUserCache
+# --- IMPORT ADMIN JOBS ---
+import stats
+from vip_links import InviteLinkPool, VIP_POOL_MAINTAIN_INTERVAL, VIP_LINK_ISSUED_GRACE
+from jobs import InactiveKicker, Reverifier, REVERIFY_ENABLED, REVERIFY_INTERVAL
+# --- IMPORT BROKER MODULE ---
+from brokers import (
+    verification_gate, VerifyRateLimited, open_http_client, close_http_client,
+    vantage_index, refresh_vantage_index, VANTAGE_SYNC_INTERVAL,
+)
 
 # ---------------- LOGGING ----------------
 logging.basicConfig(
@@ -43,17 +66,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ---------------- STARTUP TIMING ----------------
+# imports → handlers → post_init phases → pehla answered update (logs + startup_phase_seconds)
+startup = StartupTimer(BOOT_STARTED)
+startup.mark("imports")
+
 # ---------------- CONFIGURATION ----------------
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-XM_TOKEN = os.getenv("XM_TOKEN")
-VANTAGE_USER_ID = os.getenv("VANTAGE_USER_ID")
-VANTAGE_SECRET = os.getenv("VANTAGE_SECRET")
 VIP_CHANNEL_ID = os.getenv("VIP_CHANNEL_ID")
 # Admin IDs ko list mein convert kar rahe hain
 ADMIN_IDS = [str(a).strip() for a in os.getenv("ADMIN_IDS", "").split(",") if a.strip()]
 
 BROKERS = ["XM", "Vantage"]
-DB_PATH = "maharaja_bot.db"
+DB_PATH = os.getenv("DB_PATH", "maharaja_bot.db")
+INACTIVE_DAYS = 15
+# AI answers ko chunk-by-chunk dikhana (time-to-first-token hi user ki latency)
+AI_STREAMING = os.getenv("AI_STREAMING", "1") == "1"
 
 # States
 CHOOSE_BROKER, ASK_CLIENT_ID = range(2)
@@ -61,50 +89,108 @@ CHOOSE_BROKER, ASK_CLIENT_ID = range(2)
 # ---------------- RENDER KEEP-ALIVE ----------------
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = metrics.render().encode(), metrics.CONTENT_TYPE
+        else:
+            body, content_type = b"Bot is alive!", "text/plain"
         self.send_response(200)
-        self.wfile.write(b"Bot is alive!")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # har health / scrape request ka log nahi
 
 def start_web_server():
     port = int(os.environ.get("PORT", 10000))
     server = HTTPServer(('0.0.0.0', port), HealthCheckHandler)
     server.serve_forever()
 
+# ---------------- OUTBOUND TELEGRAM CALLS ----------------
+# Har Bot API call isi dispatcher se jaati hai (rate limits, edit merge, RetryAfter)
+outbox = OutboundDispatcher()
+
 # ---------------- DATABASE ----------------
-async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                tg_user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tg_user_id INTEGER,
-                broker TEXT,
-                client_id TEXT,
-                status TEXT,
-                last_trade_date TEXT, 
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS vip_links (
-                broker TEXT PRIMARY KEY,
-                invite_link TEXT
-            )
-        """)
-        await db.commit()
+# Ek hi connection poore bot ke liye — post_init (on_startup) mein open hota hai
+db = Database(DB_PATH)
+# AI gate ke liye verified users ka in-memory cache (startup pe warm hota hai)
+verified_users = VerifiedUserCache(db)
+# Gemini calls ke aage admission control (global + per-user limits, queue, retry)
+ai_scheduler = AIScheduler(retry_on=(AIBusyError,))
+# "Kick Inactive" background engine (rate-limited, resumable)
+kicker = InactiveKicker(db, verified_users, VIP_CHANNEL_ID)
+# Approved accounts ki trading activity broker se bulk mein (last_trade_date taaza rahe)
+reverifier = Reverifier(db, verified_users)
+# Pehle se bane one-time invite links (approval pe Telegram call nahi, sirf DB pop)
+vip_pool = InviteLinkPool(db, VIP_CHANNEL_ID)
+
+# ---------------- METRICS ----------------
+# /metrics scrape ke waqt existing stats() se padhe jate hain — hot path par koi cost nahi
+CallbackMetric("verified_cache_hits_total", "Verified-user cache lookups",
+               lambda: {(k,): verified_users.stats()[k] for k in ("hits", "misses")}, kind="counter", labels=("result",))
+CallbackMetric("ai_cache_hits_total", "AI answer cache lookups",
+               lambda: {(k,): response_cache.stats()[k] for k in ("memory_hits", "disk_hits", "misses")},
+               kind="counter", labels=("result",))
+CallbackMetric("gemini_tokens_total", "Gemini tokens used",
+               lambda: {(k,): usage_stats[f"{k}_tokens"] for k in ("prompt", "cached", "output")},
+               kind="counter", labels=("kind",))
+CallbackMetric("verify_gate_total", "Verification lookups by outcome (cache hit / merged / broker call)",
+               lambda: {(k,): verification_gate.stats()[k] for k in ("cache_hits", "merged", "broker_calls", "errors", "rate_limited")},
+               kind="counter", labels=("result",))
+CallbackMetric("ai_requests_in_flight", "Gemini jobs running", lambda: ai_scheduler.running)
+CallbackMetric("ai_requests_queued", "Gemini jobs waiting for a slot", lambda: ai_scheduler.queued)
+CallbackMetric("telegram_requests_in_flight", "Bot API calls running", lambda: outbox.in_flight)
+CallbackMetric("vip_links_available", "Pre-generated VIP invite links ready", lambda: vip_pool.stats()["available"])
+CallbackMetric("telegram_requests_waiting", "Bot API calls waiting for a rate-limit token", lambda: outbox.waiting)
 
-def get_db():
-    return aiosqlite.connect(DB_PATH)
+async def init_db():
+    await db.open()
+    await db.executescript("""
+        CREATE TABLE IF NOT EXISTS users (
+            tg_user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tg_user_id INTEGER,
+            broker TEXT,
+            client_id TEXT,
+            status TEXT,
+            last_trade_date TEXT, 
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- AI gate (handle_mentorship) aur re-verification ke lookups
+        CREATE INDEX IF NOT EXISTS idx_submissions_user_status ON submissions (tg_user_id, status);
+        CREATE INDEX IF NOT EXISTS idx_submissions_client_broker ON submissions (client_id, broker);
+        -- Export bina temp sort ke created_at order mein stream ho sake
+        CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions (created_at);
+        -- Kick engine: inactive members dhoondhne ke liye
+        CREATE INDEX IF NOT EXISTS idx_submissions_status_trade ON submissions (status, last_trade_date);
+
+        CREATE TABLE IF NOT EXISTS kick_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER,
+            message_id INTEGER,
+            cutoff TEXT,
+            status TEXT,
+            total INTEGER DEFAULT 0,
+            done INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+    """)
+    # Dashboard counters (triggers) — pehli baar existing data se bharte hain
+    await stats.attach(db)
 
 # ---------------- UI HELPERS (ANIMATIONS) ----------------
 async def show_processing_animation(context, chat_id, message_id, text_sequence):
     """
     Ye function messages ko edit karke animation ka effect dega.
+    Background task ki tarah chalta hai — real kaam khatam hote hi cancel ho jata hai.
     """
     for text in text_sequence:
         try:
@@ -115,34 +201,16 @@ async def show_processing_animation(context, chat_id, message_id, text_sequence)
                 parse_mode=ParseMode.MARKDOWN
             )
             await asyncio.sleep(1.0) # 1 second delay
-        except:
-            pass
-
-# ---------------- VERIFICATION LOGIC ----------------
-async def verify_xm_user(client_id):
-    if not XM_TOKEN: return False
-    url = f"https://mypartners.xm.com/api/traders/{client_id}"
-    headers = {"Authorization": f"Bearer {XM_TOKEN}", "Content-Type": "application/json"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        return response.status_code == 200
-    except: return False
-
-async def verify_vantage_user(client_id):
-    if not VANTAGE_USER_ID or not VANTAGE_SECRET: return False
-    url = "https://openapi.vantagemarkets.com/api/ibData/accountData"
-    now = datetime.datetime.now()
-    end_time = now.strftime("%Y-%m-%d %H:%M:%S")
-    start_time = (now - datetime.timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
-    payload = {"userId": int(VANTAGE_USER_ID), "secret": VANTAGE_SECRET, "startTime": start_time, "endTime": end_time}
+        except Exception as e:  # CancelledError yahan nahi pakadna — cancel turant kaam kare
+            logger.debug(f"Animation frame skipped: {e}")
+
+async def stop_animation(task):
+    """Animation task cancel karo aur uske khatam hone ka wait (taaki final edit overwrite na ho)."""
+    task.cancel()
     try:
-        response = requests.post(url, json=payload, timeout=15)
-        data = response.json()
-        if data.get("code") == 1:
-            for acc in data.get("data", []):
-                if str(acc.get("account")) == str(client_id): return True
-        return False
-    except: return False
+        await task
+    except asyncio.CancelledError:
+        pass
 
 # ---------------- SECURE LINK GENERATOR ----------------
 async def create_one_time_link(context, channel_id):
@@ -150,7 +218,8 @@ async def create_one_time_link(context, channel_id):
         invite_link = await context.bot.create_chat_invite_link(
             chat_id=channel_id,
             member_limit=1,  # Strict Limit: 1 Person
-            name="Maharaja Secure Verification" 
+            name="Maharaja Secure Verification",
+            expire_date=int(time.time() + VIP_LINK_ISSUED_GRACE),  # pool links jitni hi validity (message mein batate hain)
         )
         return invite_link.invite_link
     except Exception as e:
@@ -162,9 +231,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Save user
-    async with get_db() as db:
-        await db.execute("INSERT OR IGNORE INTO users (tg_user_id, username) VALUES (?,?)", (user.id, user.username))
-        await db.commit()
+    await db.execute("INSERT OR IGNORE INTO users (tg_user_id, username) VALUES (?,?)", (user.id, user.username))
 
     # Set Menu Buttons
     commands = [
@@ -175,6 +242,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Admin gets extra commands
     if str(user.id) in ADMIN_IDS:
         commands.append(BotCommand("admin", "👑 Admin Dashboard"))
+        commands.append(BotCommand("export", "📥 Export CSV (filters)"))
     
     await context.bot.set_my_commands(commands, scope=BotCommandScopeChat(update.effective_chat.id))
 
@@ -220,37 +288,61 @@ async def on_client_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ **Invalid Format.** Please enter numbers only.")
         return ASK_CLIENT_ID
 
-    # --- ANIMATION EFFECT START ---
+    started = time.perf_counter()
     status_msg = await update.message.reply_text("🔄 **Connecting to server...**", parse_mode=ParseMode.MARKDOWN)
     await context.bot.send_chat_action(update.effective_chat.id, ChatAction.TYPING)
     
-    # Fake processing delay for UX
-    await show_processing_animation(context, update.effective_chat.id, status_msg.message_id, [
+    # --- ANIMATION (real check ke saath-saath chalti hai) ---
+    animation = asyncio.create_task(show_processing_animation(context, update.effective_chat.id, status_msg.message_id, [
         f"📡 Checking **{broker}** Database...",
         f"🔍 Verifying ID: **{client_id}**...",
         "⏳ Finalizing status..."
-    ])
-    # --- ANIMATION EFFECT END ---
+    ]))
 
-    # Real Check
+    # Real Check (cache / same-ID lookups merge / per-user limit — brokers.VerificationGate)
     is_valid = False
-    if broker == "XM": is_valid = await verify_xm_user(client_id)
-    elif broker == "Vantage": is_valid = await verify_vantage_user(client_id)
+    check_started = time.perf_counter()
+    try:
+        is_valid = await verification_gate.verify(broker, client_id, user_id)
+    except VerifyRateLimited as e:
+        await stop_animation(animation)
+        await context.bot.edit_message_text(
+            chat_id=update.effective_chat.id, message_id=status_msg.message_id,
+            text=f"🚦 **Too many attempts.** Please try again in {max(1, round(e.retry_after / 60))} min.\nRetry: /start",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        VERIFICATIONS.inc(broker=broker, result="rate_limited")
+        return ConversationHandler.END
+    finally:
+        # Result aa gaya — bache hue animation frames skip
+        await stop_animation(animation)
+    check_ms = (time.perf_counter() - check_started) * 1000
+    VERIFICATIONS.inc(broker=broker, result="valid" if is_valid else "invalid")
     
     if is_valid:
         today_str = datetime.date.today().strftime("%Y-%m-%d")
-        async with get_db() as db:
-            await db.execute("DELETE FROM submissions WHERE client_id=? AND broker=?", (client_id, broker)) 
-            await db.execute(
-                "INSERT INTO submissions (tg_user_id, broker, client_id, status, last_trade_date) VALUES (?,?,?, 'approved', ?)",
-                (user_id, broker, client_id, today_str)
-            )
-            await db.commit()
-        
-        # GENERATE SECURE LINK
-        vip_link = None
-        if VIP_CHANNEL_ID:
-            vip_link = await create_one_time_link(context, VIP_CHANNEL_ID)
+        # Ye account pehle kisi aur user ke naam tha? Unka cached access revoke hoga
+        previous_owners = [row[0] for row in await db.fetchall(
+            "SELECT tg_user_id FROM submissions WHERE client_id=? AND broker=?", (client_id, broker)
+        )]
+        statements = [
+            ("DELETE FROM submissions WHERE client_id=? AND broker=?", (client_id, broker)),
+            ("INSERT INTO submissions (tg_user_id, broker, client_id, status, last_trade_date) VALUES (?,?,?, 'approved', ?)",
+             (user_id, broker, client_id, today_str)),
+        ]
+        # SECURE LINK: pool se (link "issued" isi transaction mein mark hota hai)
+        vip_link, mark_issued = vip_pool.pop(user_id)
+        if mark_issued:
+            statements.append(mark_issued)
+        if VIP_CHANNEL_ID and not vip_link:
+            # Pool khaali — seedha Telegram se banao (DB write ke saath-saath)
+            _, vip_link = await asyncio.gather(db.transaction(statements), create_one_time_link(context, VIP_CHANNEL_ID))
+        else:
+            await db.transaction(statements)
+        for owner in previous_owners:
+            if owner != user_id: verified_users.revoke(owner)
+        verified_users.approve(user_id)
+        APPROVALS.inc(broker=broker)
         
         if vip_link:
             msg = (
@@ -259,13 +351,15 @@ async def on_client_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"🌟 **Status:** Active\n\n"
                 f"👇 **Your Secure Invite Link:**\n"
                 f"{vip_link}\n\n"
-                f"⚠️ **WARNING:** This link can be used **ONLY ONCE**. Do not share it, or you will lose access!\n\n"
-                f"🤖 **AI Mentor Unlocked:** You can now send charts here!"
+                f"⚠️ **WARNING:** This link can be used **ONLY ONCE**. Do not share it, or you will lose access!\n"
+                f"⏳ **Valid for {VIP_LINK_ISSUED_GRACE // 3600} hours** — join before it expires.\n\n"
+                f"🤖 **AI Mentor Unlocked:** You can now send charts (or OHLC CSV files) here!"
             )
         else:
             msg = "✅ Verified! But VIP Link system is currently offline. Contact Admin."
 
         await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=status_msg.message_id, text=msg, parse_mode=ParseMode.MARKDOWN)
+        logger.info(f"Verification {broker}/{client_id}: approved in {(time.perf_counter() - started) * 1000:.0f} ms (broker check {check_ms:.0f} ms)")
         return ConversationHandler.END
     else:
         fail_msg = (
@@ -275,6 +369,7 @@ async def on_client_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Retry: /start"
         )
         await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=status_msg.message_id, text=fail_msg, parse_mode=ParseMode.MARKDOWN)
+        logger.info(f"Verification {broker}/{client_id}: rejected in {(time.perf_counter() - started) * 1000:.0f} ms (broker check {check_ms:.0f} ms)")
         return ConversationHandler.END
 
 # ---------------- ADMIN DASHBOARD ----------------
@@ -284,6 +379,7 @@ async def admin_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     keyboard = [
         [InlineKeyboardButton("📊 Show Stats", callback_data="admin:stats")],
+        [InlineKeyboardButton("📈 Timeline (14 Days)", callback_data="admin:timeline")],
         [InlineKeyboardButton("📥 Export Data (CSV)", callback_data="admin:export")],
         [InlineKeyboardButton("👢 Kick Inactive (15 Days)", callback_data="admin:kick")],
         [InlineKeyboardButton("❌ Close", callback_data="admin:close")]
@@ -305,45 +401,154 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if action == "stats":
-        async with get_db() as db:
-            db.row_factory = aiosqlite.Row
-            users = (await (await db.execute("SELECT COUNT(*) c FROM users")).fetchone())['c']
-            approved = (await (await db.execute("SELECT COUNT(*) c FROM submissions WHERE status='approved'")).fetchone())['c']
-        await query.message.reply_text(f"📊 **Statistics**\n\n👥 Total Users: {users}\n✅ Verified Users: {approved}", parse_mode=ParseMode.MARKDOWN)
+        # Triggers se maintained counters — table kitni bhi badi ho, constant time
+        totals = await stats.read_totals(db)
+        today = next(iter((await stats.read_daily(db, days=1)).values()), {})  # sirf aaj (UTC)
+        per_broker = " · ".join(f"{b}: {totals['approved'].get(b, 0)}" for b in BROKERS)
+        cache = verified_users.stats()
+        ai = response_cache.stats()
+        out = outbox.stats()
+        links = vip_pool.stats()
+        gate = verification_gate.stats()
+        await query.message.reply_text(
+            f"📊 **Statistics**\n\n👥 Total Users: {totals['users']}\n✅ Verified Users: {totals['verified_users']}\n"
+            f"🏦 Active Accounts: {per_broker}\n"
+            f"🆕 Today: +{today.get('new_users', 0)} users, +{sum(today.get('approvals', {}).values())} approvals\n\n"
+            f"⚡ AI Gate Cache: {cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate']:.1f}%)\n"
+            f"🧠 AI Answer Cache: {ai['memory_hits'] + ai['disk_hits']} hits / {ai['misses']} misses ({ai['hit_rate']:.1f}%)\n"
+            f"📤 Outbox: {out['sent']} sent, {out['waiting']} waiting, {out['coalesced']} edits merged, {out['retries']} flood retries\n"
+            f"🔗 VIP Links: {links['available']} ready, {links['issued']} issued, {links['fallbacks']} created on demand\n"
+            f"🛡 Verify Gate: {gate['broker_calls']} broker calls, {gate['cache_hits']} cached, {gate['merged']} merged, {gate['rate_limited']} rate-limited",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    elif action == "timeline":
+        timeline = await stats.read_daily(db, days=14)
+        if not timeline:
+            await query.message.reply_text("📈 No activity in the last 14 days.")
+            return
+        header = f"{'Day':<10} {'Users':>5} " + " ".join(f"{b:>7}" for b in BROKERS)
+        rows = [
+            f"{day:<10} {entry['new_users']:>5} " + " ".join(f"{entry['approvals'].get(b, 0):>7}" for b in BROKERS)
+            for day, entry in timeline.items()
+        ]
+        await query.message.reply_text(
+            "📈 **Last 14 Days** _(new users / approvals per broker, UTC)_\n\n```\n" + "\n".join([header] + rows) + "\n```",
+            parse_mode=ParseMode.MARKDOWN
+        )
 
     elif action == "export":
         await query.message.reply_text("⏳ Generating CSV...")
-        async with get_db() as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM submissions ORDER BY created_at DESC") as cursor:
-                rows = await cursor.fetchall()
-        if rows:
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(rows[0].keys())
-            for row in rows: writer.writerow(tuple(row))
-            output.seek(0)
-            bytes_io = BytesIO(output.getvalue().encode('utf-8'))
-            bytes_io.name = f"users_data.csv"
-            await context.bot.send_document(chat_id=query.message.chat_id, document=bytes_io, caption="📂 User Data")
-        else:
-            await query.message.reply_text("❌ No data found.")
+        await send_export(context, query.message.chat_id, {})
 
     elif action == "kick":
-        await query.message.reply_text("⏳ Kick process started in background...")
-        # Trigger Kick Logic (Simplified call)
-        # Real logic needs update_trade_dates_and_kick function
-        pass 
+        error = await kicker.start(context.application, query.message.chat_id, days=INACTIVE_DAYS)
+        if error:
+            await query.message.reply_text(error)
+
+# ---------------- DATA EXPORT ----------------
+EXPORT_COLUMNS = ("id", "tg_user_id", "broker", "client_id", "status", "last_trade_date", "created_at")
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024  # isse bada gzip disk pe spill hoga
+EXPORT_USAGE = (
+    "Usage: `/export broker=XM status=approved from=2024-01-01 to=2024-12-31`\n"
+    "_(Sab filters optional hain)_"
+)
+
+def parse_export_filters(args):
+    """`key=value` args ko filters dict mein badalta hai. Galat input pe ValueError."""
+    filters_ = {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        key = key.lower()
+        if not sep or not value:
+            raise ValueError(arg)
+        if key == "broker":
+            match = [b for b in BROKERS if b.lower() == value.lower()]
+            if not match: raise ValueError(arg)
+            filters_["broker"] = match[0]
+        elif key == "status":
+            filters_["status"] = value.lower()
+        elif key in ("from", "to"):
+            filters_[key] = datetime.date.fromisoformat(value)
+        else:
+            raise ValueError(arg)
+    return filters_
+
+async def build_export(filters_):
+    """
+    Submissions ko cursor se chunks mein padhkar gzip CSV banata hai.
+    Output SpooledTemporaryFile mein jata hai — chhota ho to RAM, bada ho to disk.
+    Returns (file, row_count).
+    """
+    where, params = [], []
+    if "broker" in filters_:
+        where.append("broker=?"); params.append(filters_["broker"])
+    if "status" in filters_:
+        where.append("status=?"); params.append(filters_["status"])
+    if "from" in filters_:
+        where.append("created_at >= ?"); params.append(filters_["from"].isoformat())
+    if "to" in filters_:
+        where.append("created_at < ?"); params.append((filters_["to"] + datetime.timedelta(days=1)).isoformat())
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM submissions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC"
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    text = TextIOWrapper(gzip.GzipFile(fileobj=spool, mode="wb", filename="submissions.csv"), encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    try:
+        async for chunk in db.iterate(sql, params):
+            # CSV + gzip CPU kaam thread mein, taaki event loop free rahe
+            await asyncio.to_thread(writer.writerows, chunk)
+            count += len(chunk)
+        text.close()  # gzip trailer likhta hai; spool khula rehta hai
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, count
+
+async def send_export(context, chat_id, filters_):
+    spool, count = await build_export(filters_)
+    with spool:
+        if not count:
+            await context.bot.send_message(chat_id=chat_id, text="❌ No data found.")
+            return
+        label = ", ".join(f"{k}={v}" for k, v in filters_.items()) or "all"
+        await context.bot.send_document(
+            chat_id=chat_id,
+            document=spool,
+            filename=f"users_data_{datetime.date.today():%Y%m%d}.csv.gz",
+            caption=f"📂 User Data ({count} rows, {label})",
+        )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.effective_user.id) not in ADMIN_IDS: return
+    try:
+        filters_ = parse_export_filters(context.args or [])
+    except ValueError:
+        await update.message.reply_text(EXPORT_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+    await update.message.reply_text("⏳ Generating CSV...")
+    await send_export(context, update.effective_chat.id, filters_)
 
 # ---------------- AI HANDLER (ANIMATED) ----------------
+# OHLC candle exports (MT4/MT5, TradingView): .csv naam ya text/csv MIME
+CANDLE_FILES = filters.Document.FileExtension("csv") | filters.Document.MimeType("text/csv")
+
+def is_candle_file(document):
+    return document is not None and (
+        (document.file_name or "").lower().endswith(".csv") or document.mime_type == "text/csv"
+    )
+
 async def handle_mentorship(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # Check Verification
-    is_verified = False
-    async with get_db() as db:
-        async with db.execute("SELECT 1 FROM submissions WHERE tg_user_id=? AND status='approved' LIMIT 1", (user_id,)) as cursor:
-            if await cursor.fetchone(): is_verified = True
+    is_verified = await verified_users.is_verified(user_id)
     
     if not is_verified:
         await update.message.reply_text("🔒 **Access Denied.** Verify first.", parse_mode=ParseMode.MARKDOWN)
@@ -351,27 +556,96 @@ async def handle_mentorship(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     user_text = update.message.caption or update.message.text
     image_bytes = None
-    if not user_text and not update.message.photo: return
+    mime_type = None
+    # OHLC CSV: pehle local SSM engine; caption ho to findings Gemini ko context ki tarah
+    candles = update.message.document if is_candle_file(update.message.document) else None
+    # Chart photo ya "file" ki tarah bheji gayi image (document) dono chalenge
+    chart = update.message.photo or (update.message.document if not candles else None)
+    if not user_text and not chart and not candles: return
 
     # Animation
     wait_msg = await update.message.reply_text("🤖 **Shaakuni AI is Thinking...**", parse_mode=ParseMode.MARKDOWN)
     await context.bot.send_chat_action(update.effective_chat.id, ChatAction.TYPING)
     
     try:
-        if update.message.photo:
+        if candles:
+            # numpy wala engine sirf pehli CSV pe load hota hai (cold start pe nahi)
+            from ssm_engine import analyze_upload, format_findings, compact_context, OHLC_MAX_BYTES
+            if candles.file_size and candles.file_size > OHLC_MAX_BYTES:
+                # Download se pehle hi mana — 20 MB tak ki file memory mein laane ka koi fayda nahi
+                await context.bot.edit_message_text(
+                    chat_id=update.effective_chat.id, message_id=wait_msg.message_id,
+                    text=f"⚠️ This candle file is too large (max {OHLC_MAX_BYTES // (1024 * 1024)} MB). Send fewer candles.",
+                )
+                return
+            await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=wait_msg.message_id, text="📈 **Scanning Candle Structure...**", parse_mode=ParseMode.MARKDOWN)
+            csv_file = await candles.get_file()
+            csv_stream = BytesIO()
+            await csv_file.download_to_memory(csv_stream)
+            try:
+                findings = await analyze_upload(csv_stream.getvalue())
+            except ValueError as e:
+                await context.bot.edit_message_text(
+                    chat_id=update.effective_chat.id, message_id=wait_msg.message_id,
+                    text=f"⚠️ Could not read this candle file: {e}\nSend a CSV with columns: time, open, high, low, close.",
+                )
+                return
+            if not user_text:
+                # Sirf file — engine ka jawab hi kaafi, Gemini call nahi
+                reply = LiveReply(context.bot, update.effective_chat.id, wait_msg.message_id)
+                reply.set_text(format_findings(findings))
+                await reply.finish()
+                return
+            user_text = f"{user_text}\n\n{compact_context(findings)}"
+
+        if chart:
             await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=wait_msg.message_id, text="👀 **Analyzing Chart Patterns...**", parse_mode=ParseMode.MARKDOWN)
-            photo_file = await update.message.photo[-1].get_file()
+            # Sabse bada size nahi — sabse chhota jo target resolution cover kare
+            source = pick_photo_size(update.message.photo) if update.message.photo else update.message.document
+            photo_file = await source.get_file()
             image_stream = BytesIO()
             await photo_file.download_to_memory(image_stream)
-            image_bytes = image_stream.getvalue()
+            # Downscale + recompress + asli MIME (thread pool mein)
+            image_bytes, mime_type = await prepare_chart(image_stream.getvalue())
         
-        response = await analyze_ssm_request(user_text, image_bytes)
-        
-        # Clean Output
+        # Repeat sawaal / chart: cache hit scheduler ki queue (aur Gemini slot) se pehle hi jawab
+        cached = await response_cache.get(await response_cache.make_key(user_text, image_bytes))
+        if cached is not None:
+            reply = LiveReply(context.bot, update.effective_chat.id, wait_msg.message_id)
+            reply.set_text(cached)
+            await reply.finish()
+            return
+
+        async def show_queue_position(position):
+            await context.bot.edit_message_text(
+                chat_id=update.effective_chat.id, message_id=wait_msg.message_id,
+                text=f"⏳ **Shaakuni AI is busy** — you are **#{position}** in queue...",
+                parse_mode=ParseMode.MARKDOWN
+            )
+
+        # Answer isi message mein aate-aate dikhega (throttled edits, 4096 pe split)
+        reply = LiveReply(context.bot, update.effective_chat.id, wait_msg.message_id)
+
+        async def run_ai():
+            reply.reset()  # retry ho to shuru se
+            if AI_STREAMING:
+                async for chunk in stream_ssm_request(user_text, image_bytes, mime_type=mime_type or "image/jpeg", check_cache=False):
+                    await reply.append(chunk)
+            else:
+                reply.set_text(await analyze_ssm_request(user_text, image_bytes, mime_type=mime_type or "image/jpeg",
+                                                         check_cache=False))
+
         try:
-            await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=wait_msg.message_id, text=response, parse_mode=ParseMode.MARKDOWN)
-        except:
-            await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=wait_msg.message_id, text=response)
+            await ai_scheduler.submit(user_id, run_ai, on_position=show_queue_position)
+        except UserBusy:
+            reply.set_text("⏳ Your previous request is still being analyzed. Please wait for it to finish.")
+        except QueueFull:
+            reply.set_text("🚦 Shaakuni AI is handling too many requests right now. Please try again in a minute.")
+        except AIBusyError:
+            reply.set_text("⏳ Shaakuni AI is overloaded right now. Please try again in a few minutes.")
+        
+        # Clean Output (Markdown, fail ho to plain text)
+        await reply.finish()
             
     except Exception as e:
         await context.bot.edit_message_text(chat_id=update.effective_chat.id, message_id=wait_msg.message_id, text=f"⚠️ AI Error: {str(e)}")
@@ -380,16 +654,57 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("❌ Cancelled.", reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
-# ---------------- MAIN ----------------
-def main():
-    if not BOT_TOKEN:
-        print("❌ BOT_TOKEN missing")
-        return
+# ---------------- LIFECYCLE ----------------
+async def on_startup(app: Application):
+    # PTB post_init: schema / migrations isi event loop par, updates aane se pehle
+    await init_db()
+    startup.mark("database")
+    # Broker APIs ke liye shared connection pool
+    await open_http_client()
+    # Vantage accounts ka local index: disk se load, phir background mein incremental sync
+    await vantage_index.load(db)
+    await verified_users.warm()
+    # AI answers ka SQLite cache tier
+    await response_cache.attach(db)
+    startup.mark("caches")
+    # Crash / restart se pehle adhoora kick job ho to continue karo
+    await kicker.resume(app)
+    app.job_queue.run_repeating(refresh_vantage_index, interval=VANTAGE_SYNC_INTERVAL, first=5, name="vantage_index")
+    if REVERIFY_ENABLED:
+        app.job_queue.run_repeating(reverifier.run, interval=REVERIFY_INTERVAL, first=60, name="reverify")
+    else:
+        logger.info("Re-verification off (REVERIFY_ENABLED=0) — kick button will refuse until activity syncs")
+    # Invite pool: load ab, refill / stale revoke background mein
+    await vip_pool.attach(app.bot)
+    app.job_queue.run_repeating(vip_pool.maintain, interval=VIP_POOL_MAINTAIN_INTERVAL, first=1, name="vip_links")
+    if AI_PREWARM:
+        # Gemini SDK import + model build thread mein, bot updates lena shuru kar chuka hoga
+        app.job_queue.run_once(prewarm_ai, when=0, name="gemini_prewarm")
+    startup.mark("jobs")
+
+async def on_shutdown(app: Application):
+    await close_http_client()
+    await db.close()
 
-    threading.Thread(target=start_web_server, daemon=True).start()
-    app = Application.builder().token(BOT_TOKEN).build()
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(init_db())
+# ---------------- MAIN ----------------
+def build_application(token=BOT_TOKEN, request=None, rate_limiter=outbox):
+    """
+    Saare handlers ke saath poora Application. main() aur bench/bench_bot.py dono yahi
+    use karte hain — bench fake request (Telegram) de sakta hai aur rate limiter hata sakta hai.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        # Alag users parallel, ek user ke updates order mein (ConversationHandler safe)
+        .concurrent_updates(PerUserUpdateProcessor(on_first_update=startup.first_update))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if rate_limiter is not None:
+        builder = builder.rate_limiter(rate_limiter)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    app = builder.build()
 
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -402,11 +717,30 @@ def main():
 
     app.add_handler(conv)
     app.add_handler(CommandHandler("admin", admin_dashboard))
+    app.add_handler(CommandHandler("export", export_command))
     app.add_handler(CallbackQueryHandler(admin_actions, pattern=r"^admin:"))
-    app.add_handler(MessageHandler(filters.PHOTO | (filters.TEXT & ~filters.COMMAND), handle_mentorship))
+    app.add_handler(MessageHandler(
+        filters.PHOTO | filters.Document.IMAGE | CANDLE_FILES | (filters.TEXT & ~filters.COMMAND), handle_mentorship
+    ))
+    return app
+
+def main():
+    if not BOT_TOKEN:
+        print("❌ BOT_TOKEN missing")
+        return
+
+    # DB init ab post_init (on_startup) mein — PTB ke apne event loop par
+    app = build_application()
+    startup.mark("handlers")
 
     print("✅ Maharaja Premium Bot Started...")
-    app.run_polling()
+    if WEBHOOK_URL:
+        # Ek hi server (updates + /health) isi event loop par
+        asyncio.run(run_webhook(app, int(os.environ.get("PORT", 10000)), BOT_TOKEN))
+    else:
+        # Fallback: polling + alag health thread
+        threading.Thread(target=start_web_server, daemon=True).start()
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,369 @@
+# brokers.py — IB verification for XM & Vantage over one shared async HTTP pool
+# httpx (already pulled in by python-telegram-bot) | keep-alive | per-broker limits | singleflight + result cache
+
+import os
+import time
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict, deque
+
+import httpx
+
+from metrics import BROKER_VERIFY_SECONDS, BROKER_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+XM_TOKEN = os.getenv("XM_TOKEN")
+VANTAGE_USER_ID = os.getenv("VANTAGE_USER_ID")
+VANTAGE_SECRET = os.getenv("VANTAGE_SECRET")
+
+# Base URLs env se override ho sakte hain (local stub server / benchmarks ke liye)
+XM_API_URL = os.getenv("XM_API_URL", "https://mypartners.xm.com/api").rstrip("/")
+VANTAGE_API_URL = os.getenv("VANTAGE_API_URL", "https://openapi.vantagemarkets.com/api").rstrip("/")
+
+# Vantage account index: kitni der baad background refresh, aur miss pe targeted refresh ka cooldown
+VANTAGE_SYNC_INTERVAL = int(os.getenv("VANTAGE_SYNC_INTERVAL", "300"))
+VANTAGE_REFRESH_COOLDOWN = int(os.getenv("VANTAGE_REFRESH_COOLDOWN", "30"))
+VANTAGE_BACKFILL_DAYS = 365
+
+# Verification gate: result cache TTLs aur har Telegram user ke broker lookups ki limit
+VERIFY_POSITIVE_TTL = int(os.getenv("VERIFY_POSITIVE_TTL", "3600"))
+VERIFY_NEGATIVE_TTL = int(os.getenv("VERIFY_NEGATIVE_TTL", "120"))
+VERIFY_USER_LIMIT = int(os.getenv("VERIFY_USER_LIMIT", "5"))      # naye IDs per window
+VERIFY_USER_WINDOW = int(os.getenv("VERIFY_USER_WINDOW", "600"))  # seconds
+
+# Per-broker limits: kitni requests ek saath, aur har request ka timeout (seconds)
+BROKER_LIMITS = {
+    "XM": {"concurrency": int(os.getenv("XM_CONCURRENCY", "8")), "timeout": 10.0},
+    "Vantage": {"concurrency": int(os.getenv("VANTAGE_CONCURRENCY", "4")), "timeout": 15.0},
+}
+
+# ---------------- SHARED HTTP CLIENT ----------------
+_client = None
+_semaphores = {}
+
+async def open_http_client():
+    """
+    Shared AsyncClient banata hai (connection pool + keep-alive).
+    Startup pe ek baar call hota hai; dobara call karna safe hai.
+    """
+    global _client, _semaphores
+    if _client is None:
+        pool_size = sum(cfg["concurrency"] for cfg in BROKER_LIMITS.values())
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            headers={"Content-Type": "application/json"},
+        )
+        _semaphores = {name: asyncio.Semaphore(cfg["concurrency"]) for name, cfg in BROKER_LIMITS.items()}
+        logger.info("Broker HTTP pool opened (%d connections)", pool_size)
+    return _client
+
+async def close_http_client():
+    global _client, _semaphores
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _semaphores = {}
+        logger.info("Broker HTTP pool closed")
+
+async def broker_request(broker, method, url, **kwargs):
+    """
+    Ek broker API call: shared pool use karta hai, broker ki concurrency limit
+    aur timeout apply karta hai. Network errors caller tak jaate hain.
+    """
+    client = await open_http_client()
+    limits = BROKER_LIMITS[broker]
+    async with _semaphores[broker]:
+        with BROKER_IN_FLIGHT.track(broker=broker):
+            return await client.request(method, url, timeout=limits["timeout"], **kwargs)
+
+# ---------------- VERIFICATION LOGIC ----------------
+@BROKER_VERIFY_SECONDS.time(broker="XM")
+async def lookup_xm_user(client_id):
+    """Seedha XM API. 200 = valid, 404 = invalid; baaki status / network errors raise hote hain."""
+    url = f"{XM_API_URL}/traders/{client_id}"
+    headers = {"Authorization": f"Bearer {XM_TOKEN}"}
+    response = await broker_request("XM", "GET", url, headers=headers)
+    if response.status_code in (200, 404):
+        return response.status_code == 200
+    response.raise_for_status()
+    return False
+
+@BROKER_VERIFY_SECONDS.time(broker="Vantage")
+async def lookup_vantage_user(client_id):
+    """Local index (miss pe targeted refresh). Sync fail ho to exception raise hota hai."""
+    return await vantage_index.contains(client_id)
+
+# ---------------- VANTAGE ACCOUNT INDEX ----------------
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+async def fetch_vantage_accounts(start, end):
+    """
+    accountData API se [start, end] window ke saare account numbers laata hai.
+    API error pe exception raise karta hai (caller decide kare kya karna hai).
+    """
+    url = f"{VANTAGE_API_URL}/ibData/accountData"
+    payload = {
+        "userId": int(VANTAGE_USER_ID), "secret": VANTAGE_SECRET,
+        "startTime": start.strftime(TIME_FMT), "endTime": end.strftime(TIME_FMT),
+    }
+    response = await broker_request("Vantage", "POST", url, json=payload)
+    data = response.json()
+    if data.get("code") != 1:
+        raise RuntimeError(f"Vantage accountData failed: {data.get('msg') or data.get('code')}")
+    return {str(acc.get("account")) for acc in data.get("data") or [] if acc.get("account") is not None}
+
+class VantageAccountIndex:
+    """
+    Vantage IB accounts ka local index: memory mein set (O(1) lookup),
+    SQLite table mein backup. Har sync sirf last sync ke baad wali window maangta hai.
+    """
+    OVERLAP = datetime.timedelta(minutes=10)  # clock skew / late records ke liye
+
+    def __init__(self):
+        self.accounts = set()
+        self.last_sync = None      # data kahan tak pull ho chuka hai
+        self.last_attempt = None   # loop.time() of last sync attempt
+        self.db = None
+        self._lock = asyncio.Lock()
+
+    async def load(self, db):
+        """Bot ke Database se index load karta hai (startup pe ek baar)."""
+        self.db = db
+        await db.executescript("""
+            CREATE TABLE IF NOT EXISTS vantage_accounts (
+                account TEXT PRIMARY KEY,
+                seen_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.accounts = {row[0] for row in await db.fetchall("SELECT account FROM vantage_accounts")}
+        last = await db.fetchval("SELECT value FROM sync_state WHERE name='vantage_accounts'")
+        self.last_sync = datetime.datetime.strptime(last, TIME_FMT) if last else None
+        logger.info(f"Vantage index loaded: {len(self.accounts)} accounts, last sync {self.last_sync}")
+
+    async def sync(self):
+        """Incremental refresh. Naye accounts ki ginti return karta hai."""
+        async with self._lock:
+            self.last_attempt = asyncio.get_running_loop().time()
+            now = datetime.datetime.now()
+            if self.last_sync:
+                start = self.last_sync - self.OVERLAP
+            else:
+                start = now - datetime.timedelta(days=VANTAGE_BACKFILL_DAYS)
+            fetched = await fetch_vantage_accounts(start, now)
+            new = fetched - self.accounts
+            self.accounts |= new
+            self.last_sync = now
+            if self.db is not None:
+                seen = now.strftime(TIME_FMT)
+                if new:
+                    await self.db.executemany(
+                        "INSERT OR IGNORE INTO vantage_accounts (account, seen_at) VALUES (?,?)",
+                        [(acc, seen) for acc in new],
+                    )
+                await self.db.execute(
+                    "INSERT OR REPLACE INTO sync_state (name, value) VALUES ('vantage_accounts', ?)",
+                    (seen,),
+                )
+            if new:
+                logger.info(f"Vantage index: +{len(new)} accounts ({len(self.accounts)} total)")
+            return len(new)
+
+    async def contains(self, client_id):
+        """
+        Pehle memory check. Miss hone par ek targeted refresh (sirf naya window),
+        lekin cooldown ke andar dobara network nahi — galat IDs API ko hammer na karein.
+        """
+        client_id = str(client_id)
+        if client_id in self.accounts:
+            return True
+        if self._lock.locked():
+            # Koi aur sync already chal raha hai — usi ka result use karo
+            async with self._lock:
+                pass
+        elif self.last_attempt is None or asyncio.get_running_loop().time() - self.last_attempt >= VANTAGE_REFRESH_COOLDOWN:
+            await self.sync()
+        return client_id in self.accounts
+
+vantage_index = VantageAccountIndex()
+
+# ---------------- BULK ACTIVITY (RE-VERIFICATION) ----------------
+# Note: dono endpoints ka shape assumed hai (IB portal exports jaisa) — asli API docs milne par
+# sirf ye do functions badalne honge. Tab tak Reverifier REVERIFY_ENABLED ke peeche band hai. Dono {account: "YYYY-MM-DD" last trade} return karte hain.
+ACTIVITY_PAGE_SIZE = 1000
+
+async def fetch_xm_activity(since):
+    """XM: `since` ke baad trade karne wale saare IB traders, paginated (ek page = ek call)."""
+    url = f"{XM_API_URL}/traders/activity"
+    headers = {"Authorization": f"Bearer {XM_TOKEN}"}
+    activity, page, seen = {}, 1, set()
+    while page:
+        if page in seen:
+            # Same nextPage dobara — loop mein atakne ke bajaye fail (cursor aage nahi badhega)
+            raise RuntimeError(f"XM activity pagination repeated page {page!r}")
+        seen.add(page)
+        response = await broker_request("XM", "GET", url, headers=headers, params={
+            "from": since.strftime("%Y-%m-%d"), "page": page, "pageSize": ACTIVITY_PAGE_SIZE,
+        })
+        response.raise_for_status()
+        data = response.json()
+        for row in data.get("data") or []:
+            account, traded = str(row.get("traderId") or ""), str(row.get("lastTradeDate") or "")[:10]
+            if account and traded > activity.get(account, ""):
+                activity[account] = traded
+        page = data.get("nextPage")
+    return activity
+
+async def fetch_vantage_activity(start, end):
+    """Vantage: [start, end] window ke trades, account-wise latest date."""
+    url = f"{VANTAGE_API_URL}/ibData/tradeData"
+    payload = {
+        "userId": int(VANTAGE_USER_ID), "secret": VANTAGE_SECRET,
+        "startTime": start.strftime(TIME_FMT), "endTime": end.strftime(TIME_FMT),
+    }
+    response = await broker_request("Vantage", "POST", url, json=payload)
+    data = response.json()
+    if data.get("code") != 1:
+        raise RuntimeError(f"Vantage tradeData failed: {data.get('msg') or data.get('code')}")
+    activity = {}
+    for row in data.get("data") or []:
+        account, traded = str(row.get("account") or ""), str(row.get("closeTime") or row.get("openTime") or "")[:10]
+        if account and traded > activity.get(account, ""):
+            activity[account] = traded
+    return activity
+
+def broker_configured(broker):
+    return bool(XM_TOKEN) if broker == "XM" else bool(VANTAGE_USER_ID and VANTAGE_SECRET)
+
+async def fetch_activity(broker, start, end):
+    if broker == "XM":
+        return await fetch_xm_activity(start)
+    return await fetch_vantage_activity(start, end)
+
+async def refresh_vantage_index(context=None):
+    """JobQueue callback: background incremental refresh."""
+    if not VANTAGE_USER_ID or not VANTAGE_SECRET:
+        return
+    try:
+        await vantage_index.sync()
+    except Exception as e:
+        logger.warning(f"Vantage index refresh failed: {e!r}")
+
+# ---------------- VERIFICATION GATE ----------------
+class VerifyRateLimited(Exception):
+    """User ne window mein bahut saare naye IDs try kiye. retry_after = seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class VerificationGate:
+    """
+    lookup_xm_user / lookup_vantage_user ke aage ek layer — verification ka akela rasta:
+
+    - Singleflight: same (broker, client_id) ke ek saath aaye lookups ek hi broker call share karte hain.
+    - Result cache: valid lamba (VERIFY_POSITIVE_TTL), invalid chhota (VERIFY_NEGATIVE_TTL) — /start
+      par wahi galat ID baar-baar bhejne se API call nahi hoti. Network / API errors cache nahi hote.
+    - Per-user limit: ek Telegram user window mein sirf VERIFY_USER_LIMIT naye lookups
+      karwa sakta hai (cache hits aur merged lookups nahi gine jaate).
+    """
+
+    LOOKUPS = {"XM": lookup_xm_user, "Vantage": lookup_vantage_user}
+
+    def __init__(self, positive_ttl=VERIFY_POSITIVE_TTL, negative_ttl=VERIFY_NEGATIVE_TTL,
+                 user_limit=VERIFY_USER_LIMIT, user_window=VERIFY_USER_WINDOW, maxsize=20000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.user_limit = user_limit
+        self.user_window = user_window
+        self.maxsize = maxsize
+        self._results = OrderedDict()   # key -> (valid, expires_at)
+        self._inflight = {}             # key -> Task
+        self._attempts = {}             # tg_user_id -> deque[monotonic]
+        self.cache_hits = 0
+        self.merged = 0
+        self.broker_calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    async def verify(self, broker, client_id, user_id=None):
+        lookup = self.LOOKUPS.get(broker)
+        if lookup is None or not broker_configured(broker):
+            return False
+        key = (broker, str(client_id).strip())
+        now = time.monotonic()
+
+        cached = self._results.get(key)
+        if cached is not None:
+            if cached[1] > now:
+                self._results.move_to_end(key)
+                self.cache_hits += 1
+                return cached[0]
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.merged += 1
+        else:
+            if user_id is not None:
+                self._take_attempt(user_id, now)
+            self.broker_calls += 1
+            task = asyncio.ensure_future(self._lookup(lookup, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+        # shield: ek caller cancel ho to baaki merged callers ka lookup chalta rahe
+        return await asyncio.shield(task)
+
+    async def _lookup(self, lookup, key):
+        try:
+            valid = await lookup(key[1])
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{key[0]} verify error ({key[1]}): {e!r}")
+            return False
+        ttl = self.positive_ttl if valid else self.negative_ttl
+        self._results[key] = (valid, time.monotonic() + ttl)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return valid
+
+    def _take_attempt(self, user_id, now):
+        attempts = self._attempts.get(user_id)
+        if attempts is None:
+            if len(self._attempts) > 50000:
+                self._prune(now)
+            attempts = self._attempts[user_id] = deque()
+        while attempts and now - attempts[0] >= self.user_window:
+            attempts.popleft()
+        if len(attempts) >= self.user_limit:
+            self.rate_limited += 1
+            raise VerifyRateLimited(self.user_window - (now - attempts[0]))
+        attempts.append(now)
+
+    def _prune(self, now):
+        for user_id in [u for u, a in self._attempts.items() if not a or now - a[-1] >= self.user_window]:
+            del self._attempts[user_id]
+
+    def stats(self):
+        return {
+            "cache_hits": self.cache_hits,
+            "merged": self.merged,
+            "broker_calls": self.broker_calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "cached": len(self._results),
+        }
+
+verification_gate = VerificationGate()
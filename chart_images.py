@@ -0,0 +1,89 @@
+# chart_images.py — Chart screenshot preprocessing before the vision model
+# Right PhotoSize pick | real MIME detection | downscale + recompress in a thread pool
+
+import io
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow na ho to images as-is jaati hain (sirf MIME detect hota hai)
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+# Chart padhne ke liye itna kaafi hai — isse badi image sirf upload/latency badhati hai
+CHART_TARGET_PX = int(os.getenv("CHART_TARGET_PX", "1280"))        # long side
+CHART_MAX_BYTES = int(os.getenv("CHART_MAX_BYTES", str(350 * 1024)))
+PASSTHROUGH_MIME = {"image/jpeg", "image/png", "image/webp"}
+
+# CPU kaam (decode / resize / encode) event loop se bahar
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chart-img")
+
+# ---------------- HELPERS ----------------
+def pick_photo_size(photos, target=CHART_TARGET_PX):
+    """
+    Telegram har photo ke kai PhotoSize bhejta hai (chhote se bade).
+    Sabse chhota jo target resolution cover kare, warna sabse bada.
+    """
+    for size in sorted(photos, key=lambda p: p.width * p.height):
+        if max(size.width, size.height) >= target:
+            return size
+    return max(photos, key=lambda p: p.width * p.height)
+
+def detect_mime(data):
+    """Magic bytes se asli image type (file name / Telegram label pe bharosa nahi)."""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return None
+
+def _shrink(data, mime, target, max_bytes):
+    with Image.open(io.BytesIO(data)) as img:
+        if mime in PASSTHROUGH_MIME and len(data) <= max_bytes and max(img.size) <= target:
+            return data, mime
+        img.thumbnail((target, target), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparent PNG → white background (charts ke liye sahi)
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, "white")
+            img.paste(rgba, mask=rgba.split()[-1])
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        out = b""
+        for quality in (85, 75, 65, 55, 45):
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=quality, optimize=True)
+            out = buffer.getvalue()
+            if len(out) <= max_bytes:
+                break
+        return out, "image/jpeg"
+
+def preprocess_chart(data, target=CHART_TARGET_PX, max_bytes=CHART_MAX_BYTES):
+    """Sync version: (bytes, mime) return karta hai. Unsupported / broken image pe ValueError."""
+    mime = detect_mime(data)
+    if Image is None:
+        if mime not in PASSTHROUGH_MIME:
+            raise ValueError("Unsupported image format")
+        return data, mime
+    try:
+        return _shrink(data, mime, target, max_bytes)
+    except Exception as e:
+        raise ValueError(f"Could not read image: {e}") from e
+
+async def prepare_chart(data, target=CHART_TARGET_PX, max_bytes=CHART_MAX_BYTES):
+    loop = asyncio.get_running_loop()
+    before = len(data)
+    out, mime = await loop.run_in_executor(_executor, preprocess_chart, data, target, max_bytes)
+    logger.info(f"Chart preprocessed: {before // 1024} KB -> {len(out) // 1024} KB ({mime})")
+    return out, mime
@@ -0,0 +1,228 @@
+# database.py — One long-lived SQLite connection for the whole bot
+# aiosqlite | WAL | tuned pragmas | statement cache | batched write queue
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+import aiosqlite
+
+from metrics import DB_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# WAL: readers writers ko block nahi karte; NORMAL sync WAL ke saath safe + fast hai
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache
+    "PRAGMA mmap_size=134217728",    # 128 MB memory-mapped reads
+    "PRAGMA busy_timeout=5000",
+)
+
+class Database:
+    """
+    Poore process ke liye ek hi connection (ek hi aiosqlite worker thread).
+
+    - Reads seedha connection par chalte hain (autocommit mode).
+    - Writes ek queue mein jaate hain; writer task unhe batch karke ek
+      transaction mein commit karta hai. Har write apne SAVEPOINT mein hota hai,
+      isliye ek fail hua write baaki batch ko kharab nahi karta.
+    - sqlite3 ka statement cache bada rakha hai, taaki same SQL text dobara
+      parse na ho (prepared statements reuse hote hain).
+    """
+
+    def __init__(self, path, batch_size=200, statement_cache=256):
+        self.path = path
+        self.batch_size = batch_size
+        self.statement_cache = statement_cache
+        self.conn = None
+        self._queue = None
+        self._writer = None
+
+    async def open(self):
+        if self.conn is not None:
+            return self
+        # isolation_level=None: transactions hum khud BEGIN/COMMIT se control karte hain
+        self.conn = await aiosqlite.connect(
+            self.path, isolation_level=None, cached_statements=self.statement_cache
+        )
+        self.conn.row_factory = aiosqlite.Row
+        for pragma in PRAGMAS:
+            await self.conn.execute(pragma)
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Database opened: {self.path} (WAL)")
+        return self
+
+    async def close(self):
+        if self.conn is None:
+            return
+        # Pending writes flush karo, phir writer band
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        await self.conn.execute("PRAGMA optimize")
+        await self.conn.close()
+        self.conn = None
+        logger.info("Database closed")
+
+    # ---------------- READS ----------------
+    @DB_QUERY_SECONDS.time(op="read")
+    async def fetchone(self, sql, params=()):
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+    @DB_QUERY_SECONDS.time(op="read")
+    async def fetchall(self, sql, params=()):
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def fetchval(self, sql, params=(), default=None):
+        row = await self.fetchone(sql, params)
+        return row[0] if row is not None else default
+
+    async def iterate(self, sql, params=(), chunk_size=1000):
+        """Bade result sets ke liye: rows chunks mein yield hote hain, poora table memory mein nahi aata."""
+        async with self.conn.execute(sql, params) as cursor:
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    # ---------------- WRITES ----------------
+    async def execute(self, sql, params=()):
+        """Ek write statement. Commit hone ke baad rowcount return karta hai."""
+        return await self.transaction([(sql, params)])
+
+    @DB_QUERY_SECONDS.time(op="write")
+    async def executemany(self, sql, seq_of_params):
+        return await self._submit(("many", sql, list(seq_of_params)))
+
+    @DB_QUERY_SECONDS.time(op="write")
+    async def transaction(self, statements):
+        """
+        Kai statements ek saath (all-or-nothing). statements = [(sql, params), ...]
+        Aakhri statement ka rowcount return hota hai.
+        """
+        return await self._submit(("tx", list(statements)))
+
+    async def executescript(self, script):
+        """Schema / migrations ke liye — queue ke bahar, seedha chalta hai."""
+        await self._queue.join()
+        await self.conn.executescript(script)
+
+    async def _submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def _run_job(self, job):
+        if job[0] == "many":
+            cursor = await self.conn.executemany(job[1], job[2])
+        else:
+            cursor = None
+            for sql, params in job[1]:
+                cursor = await self.conn.execute(sql, params)
+        return cursor.rowcount if cursor is not None else 0
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Jo bhi aur writes already wait kar rahe hain, sab isi commit mein
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            results = []
+            try:
+                await self.conn.execute("BEGIN IMMEDIATE")
+                for job, future in batch:
+                    await self.conn.execute("SAVEPOINT w")
+                    try:
+                        results.append((future, await self._run_job(job), None))
+                        await self.conn.execute("RELEASE w")
+                    except Exception as e:
+                        await self.conn.execute("ROLLBACK TO w")
+                        await self.conn.execute("RELEASE w")
+                        results.append((future, None, e))
+                await self.conn.execute("COMMIT")
+            except Exception as e:
+                logger.error(f"DB batch commit failed: {e!r}")
+                if self.conn.in_transaction:
+                    await self.conn.rollback()
+                results = [(future, None, e) for _, future in batch]
+            finally:
+                for future, value, error in results:
+                    if future.done():
+                        continue
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(value)
+                for _ in batch:
+                    self._queue.task_done()
+
+# ---------------- VERIFIED USER CACHE ----------------
+class VerifiedUserCache:
+    """
+    AI mentor gate ke liye in-process cache: tg_user_id -> verified ya nahi.
+    LRU se bounded, har entry TTL ke baad expire hoti hai (phir DB se dobara check).
+    Approve / revoke hone par caller isse turant update karta hai.
+    """
+
+    def __init__(self, db, maxsize=50000, ttl=3600):
+        self.db = db
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> (verified, expires_at)
+
+    def _set(self, user_id, verified):
+        self._entries[user_id] = (verified, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def warm(self):
+        """Startup pe sabse recent approved users pre-load karo."""
+        rows = await self.db.fetchall(
+            "SELECT tg_user_id FROM submissions WHERE status='approved' "
+            "GROUP BY tg_user_id ORDER BY MAX(id) DESC LIMIT ?",
+            (self.maxsize,),
+        )
+        # Purane pehle daalo, taaki LRU mein sabse recent users end mein rahein
+        for row in reversed(rows):
+            self._set(row[0], True)
+        logger.info(f"Verified cache warmed with {len(rows)} users")
+
+    async def is_verified(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry[0]
+        self.misses += 1
+        verified = await self.db.fetchone(
+            "SELECT 1 FROM submissions WHERE tg_user_id=? AND status='approved' LIMIT 1", (user_id,)
+        ) is not None
+        self._set(user_id, verified)
+        return verified
+
+    def approve(self, user_id):
+        self._set(user_id, True)
+
+    def revoke(self, user_id):
+        # Entry hata do — agla check DB se hoga (user ke dusre approved accounts bhi ho sakte hain)
+        self._entries.pop(user_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": rate}
@@ -0,0 +1,329 @@
+# jobs.py — Background admin jobs (inactive member kick engine, bulk re-verification)
+# Resumable | rate-limited worker pool | batched DB updates
+
+import os
+import time
+import asyncio
+import logging
+import datetime
+
+from telegram.error import RetryAfter, BadRequest, Forbidden, NetworkError
+
+from brokers import TIME_FMT, broker_configured, fetch_activity
+
+logger = logging.getLogger(__name__)
+
+# ---------------- INACTIVE KICK ENGINE ----------------
+# Reverifier ka cursor isse purana ho to us broker ka last_trade_date bharose layak nahi
+KICK_SYNC_MAX_AGE = datetime.timedelta(hours=24)
+
+class InactiveKicker:
+    """
+    VIP channel se inactive members nikalne ka background job.
+
+    Flow:
+      1. start(): inactive approved submissions ko 'kick_pending' mark karo
+         aur kick_jobs mein ek row banao (ye snapshot crash ke baad bhi rehta hai).
+         Sirf un brokers ke users jinka reverify cursor taaza hai — bina sync ke
+         last_trade_date approval day hi hota hai aur har purana member "inactive" lagta.
+      2. Workers pending users ko channel se remove karte hain — global rate
+         limit ke andar, RetryAfter aane par sab workers ruk jaate hain.
+      3. Results batch mein DB mein likhe jaate hain: 'kicked', ya fail hone par
+         wapas 'approved' (user abhi bhi channel mein hai, agla job retry karega).
+      4. Restart par resume() bache hue 'kick_pending' users se aage chalata hai.
+    """
+
+    def __init__(self, db, verified_cache, channel_id, workers=4, rate=5.0, batch_size=50):
+        self.db = db
+        self.verified_cache = verified_cache
+        self.channel_id = channel_id
+        self.workers = workers
+        self.rate = rate                  # max channel removals per second
+        self.batch_size = batch_size
+        self._running = False
+        self._next_slot = 0.0
+        self._pause_until = 0.0
+        self._rate_lock = asyncio.Lock()
+
+    @property
+    def running(self):
+        return self._running
+
+    async def start(self, application, admin_chat_id, days):
+        """Naya kick job. User ko dikhane layak message return karta hai."""
+        if self._running:
+            return "⏳ A kick job is already running."
+        if not self.channel_id:
+            return "❌ VIP_CHANNEL_ID is not configured."
+
+        self._running = True  # pehle await se pehle — double-click se do jobs na banein
+        try:
+            unfinished = await self._unfinished_job()
+            if unfinished is not None:
+                self._launch(application, unfinished)
+                return f"▶️ Resuming unfinished kick job #{unfinished['id']}..."
+
+            brokers = await self._synced_brokers()
+            if not brokers:
+                self._running = False
+                return ("❌ Broker trade activity has not synced in the last 24h (REVERIFY_ENABLED is off "
+                        "or re-verification is failing). Nobody was kicked.")
+
+            cutoff = (datetime.date.today() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+            status_msg = await application.bot.send_message(
+                admin_chat_id, f"⏳ Kick process started (inactive since {cutoff}, brokers: {', '.join(brokers)})..."
+            )
+            marks = ",".join("?" * len(brokers))
+            await self.db.transaction([
+                ("UPDATE submissions SET status='kick_pending' WHERE status='approved' AND last_trade_date < ? "
+                 f"AND broker IN ({marks})", (cutoff, *brokers)),
+                ("INSERT INTO kick_jobs (chat_id, message_id, cutoff, status) VALUES (?,?,?, 'running')",
+                 (admin_chat_id, status_msg.message_id, cutoff)),
+            ])
+            job = await self._unfinished_job()
+        except Exception:
+            self._running = False
+            raise
+        application.create_task(self._run(application.bot, job), name=f"kick_job_{job['id']}")
+        return None
+
+    async def resume(self, application):
+        """Startup pe: adhoora job (crash / restart) wahin se continue karo."""
+        if self._running:
+            return
+        self._running = True  # start() ke saath race na ho
+        try:
+            job = await self._unfinished_job()
+        except Exception:
+            self._running = False
+            raise
+        if job is None:
+            self._running = False
+            return
+        self._launch(application, job)
+
+    async def _synced_brokers(self):
+        """Jin brokers ka re-verification KICK_SYNC_MAX_AGE ke andar successful hua."""
+        fresh = (datetime.datetime.now() - KICK_SYNC_MAX_AGE).strftime(TIME_FMT)
+        rows = await self.db.fetchall(
+            "SELECT name FROM sync_state WHERE name LIKE 'reverify:%' AND value >= ? ORDER BY name", (fresh,)
+        )
+        return [row[0].split(":", 1)[1] for row in rows]
+
+    async def _unfinished_job(self):
+        return await self.db.fetchone("SELECT * FROM kick_jobs WHERE status='running' ORDER BY id DESC LIMIT 1")
+
+    def _launch(self, application, job):
+        """Adhoora job chalao — caller ne _running pehle hi set kar diya hai."""
+        logger.info(f"Resuming kick job #{job['id']}")
+        application.create_task(self._run(application.bot, job), name=f"kick_job_{job['id']}")
+
+    # ---------------- INTERNALS ----------------
+    async def _throttle(self):
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            now = loop.time()
+            wait = max(self._next_slot, self._pause_until) - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+                now = loop.time()
+            self._next_slot = now + 1.0 / self.rate
+
+    async def _remove_member(self, bot, user_id):
+        """Returns True agar user channel se bahar hai (ya tha hi nahi)."""
+        for attempt in range(5):
+            await self._throttle()
+            try:
+                # Short ban = kick: Telegram ~1 min baad khud unban kar deta hai, user naye link se wapas aa sakta hai
+                until = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=60)
+                await bot.ban_chat_member(self.channel_id, user_id, until_date=until)
+                return True
+            except RetryAfter as e:
+                # Flood control: saare workers ko rok do
+                retry = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+                self._pause_until = asyncio.get_running_loop().time() + retry + 1
+                logger.warning(f"Kick flood limit, pausing {retry}s")
+            except BadRequest as e:
+                if "not found" in str(e).lower() or "participant" in str(e).lower():
+                    return True
+                logger.warning(f"Kick failed for {user_id}: {e}")
+                return False
+            except Forbidden as e:
+                logger.error(f"Kick forbidden (bot admin rights?): {e}")
+                return False
+            except NetworkError as e:
+                logger.warning(f"Kick network error for {user_id} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(2 ** attempt)
+        return False
+
+    async def _flush(self, job_id, results):
+        statements = [
+            ("UPDATE submissions SET status=? WHERE tg_user_id=? AND status='kick_pending'",
+             ("kicked" if ok else "approved", user_id))
+            for user_id, ok in results
+        ]
+        done = sum(1 for _, ok in results if ok)
+        statements.append((
+            "UPDATE kick_jobs SET done = done + ?, failed = failed + ? WHERE id=?",
+            (done, len(results) - done, job_id),
+        ))
+        await self.db.transaction(statements)
+        for user_id, ok in results:
+            if ok: self.verified_cache.revoke(user_id)
+
+    async def _report(self, bot, job, text):
+        try:
+            await bot.edit_message_text(chat_id=job["chat_id"], message_id=job["message_id"], text=text)
+        except Exception as e:
+            logger.debug(f"Kick progress edit skipped: {e}")
+
+    async def _run(self, bot, job):
+        job_id = job["id"]
+        try:
+            # Jin users ke paas koi aur active approved account hai, unhe kick nahi karna
+            await self.db.execute(
+                "UPDATE submissions SET status='inactive' WHERE status='kick_pending' "
+                "AND tg_user_id IN (SELECT tg_user_id FROM submissions WHERE status='approved')"
+            )
+            rows = await self.db.fetchall("SELECT DISTINCT tg_user_id FROM submissions WHERE status='kick_pending'")
+            pending = [row[0] for row in rows]
+            base = await self.db.fetchone("SELECT done, failed FROM kick_jobs WHERE id=?", (job_id,))
+            total = len(pending) + base["done"] + base["failed"]
+            await self.db.execute("UPDATE kick_jobs SET total=? WHERE id=?", (total, job_id))
+
+            queue = asyncio.Queue()
+            for user_id in pending: queue.put_nowait(user_id)
+            results = []
+            progress = {"done": base["done"], "failed": base["failed"], "reported": 0.0}
+            flush_lock = asyncio.Lock()
+
+            async def flush(force=False):
+                async with flush_lock:
+                    if not results or (not force and len(results) < self.batch_size):
+                        return
+                    batch = results[:]
+                    results.clear()
+                    await self._flush(job_id, batch)
+                    now = time.monotonic()
+                    if force or now - progress["reported"] > 3:
+                        progress["reported"] = now
+                        await self._report(bot, job, f"⏳ Kicking inactive members... {progress['done'] + progress['failed']}/{total}")
+
+            async def worker():
+                while True:
+                    try:
+                        user_id = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    ok = await self._remove_member(bot, user_id)
+                    progress["done" if ok else "failed"] += 1
+                    results.append((user_id, ok))
+                    await flush()
+
+            await asyncio.gather(*(worker() for _ in range(self.workers)))
+            await flush(force=True)
+            await self.db.execute(
+                "UPDATE kick_jobs SET status='done', finished_at=CURRENT_TIMESTAMP WHERE id=?", (job_id,)
+            )
+            await self._report(bot, job, (
+                f"✅ Kick job finished\n\n👢 Removed: {progress['done']}\n"
+                f"⚠️ Failed: {progress['failed']}\n📅 Inactive since: {job['cutoff']}"
+            ))
+            logger.info(f"Kick job #{job_id} done: {progress['done']} removed, {progress['failed']} failed")
+        except Exception as e:
+            # Job 'running' hi rehta hai — agle restart pe resume hoga
+            logger.error(f"Kick job #{job_id} crashed: {e!r}")
+            await self._report(bot, job, f"⚠️ Kick job interrupted: {e}. It will resume on restart.")
+        finally:
+            self._running = False
+
+# ---------------- BULK RE-VERIFICATION ----------------
+# Activity endpoints abhi broker docs se confirm nahi — "1" karne par hi background job chalega
+REVERIFY_ENABLED = os.getenv("REVERIFY_ENABLED", "0") == "1"
+REVERIFY_INTERVAL = int(os.getenv("REVERIFY_INTERVAL", str(6 * 3600)))  # seconds
+REVERIFY_BACKFILL_DAYS = 30   # pehli run (koi cursor nahi) kitna peeche dekhe
+
+class Reverifier:
+    """
+    Approved accounts ka last_trade_date broker ke bulk activity data se update karta hai
+    (per broker ek / kuch paginated calls — har user ke liye alag call nahi).
+
+    - Har broker ka cursor sync_state mein: window pichle run ke end se shuru (overlap ke saath).
+    - Saare approved / inactive submissions memory mein diff hote hain, phir ek executemany.
+    - Cursor DB write ke baad hi aage badhta hai; beech mein crash ho to agla run wahi
+      window dobara leta hai (update idempotent hai — naya date hi jeet ta hai).
+    - 'inactive' account mein dobara trading dikhe to wapas 'approved'.
+    - UPDATE sirf 'approved' / 'inactive' rows pe: beech mein kicker ne row 'kick_pending' /
+      'kicked' kar di ho to wo overwrite nahi hoti.
+    - Limitation: ye pass kisi ko demote nahi karta. Broker feeds sirf activity deti hain, aur
+      vantage_accounts index sirf badhta hai (backfill window tak, IB chhodne wale hat te nahi) —
+      "IB ke under nahi raha" kisi data se pata nahi chalta. Inactive accounts kick engine
+      (last_trade_date cutoff) se nikalte hain.
+    """
+    OVERLAP = datetime.timedelta(hours=1)
+
+    def __init__(self, db, verified_cache, brokers=("XM", "Vantage")):
+        self.db = db
+        self.verified_cache = verified_cache
+        self.brokers = brokers
+        self.last_run = {}
+        self._lock = asyncio.Lock()
+
+    async def run(self, context=None):
+        """JobQueue callback. Pichla run chal raha ho to skip."""
+        if self._lock.locked():
+            return
+        async with self._lock:
+            for broker in self.brokers:
+                if not broker_configured(broker):
+                    continue
+                try:
+                    await self.reverify(broker)
+                except Exception as e:
+                    logger.warning(f"{broker} re-verification failed: {e!r}")
+
+    async def reverify(self, broker):
+        """Ek broker ka incremental pass. Updated rows ki ginti return karta hai."""
+        started = time.perf_counter()
+        now = datetime.datetime.now()
+        state_key = f"reverify:{broker}"
+        cursor = await self.db.fetchval("SELECT value FROM sync_state WHERE name=?", (state_key,))
+        if cursor:
+            start = datetime.datetime.strptime(cursor, TIME_FMT) - self.OVERLAP
+        else:
+            start = now - datetime.timedelta(days=REVERIFY_BACKFILL_DAYS)
+        activity = await fetch_activity(broker, start, now)
+
+        updates, revived, scanned = [], set(), 0
+        if activity:
+            async for rows in self.db.iterate(
+                "SELECT id, tg_user_id, client_id, last_trade_date, status FROM submissions "
+                "WHERE broker=? AND status IN ('approved', 'inactive')", (broker,)
+            ):
+                scanned += len(rows)
+                for row in rows:
+                    traded = activity.get(row["client_id"])
+                    if traded is None:
+                        continue
+                    last_trade = max(traded, row["last_trade_date"] or "")
+                    if last_trade != row["last_trade_date"] or row["status"] != "approved":
+                        updates.append((last_trade, "approved", row["id"]))
+                        if row["status"] != "approved":
+                            revived.add(row["tg_user_id"])
+        if updates:
+            await self.db.executemany(
+                "UPDATE submissions SET last_trade_date=?, status=? WHERE id=? AND status IN ('approved', 'inactive')",
+                updates,
+            )
+        await self.db.execute(
+            "INSERT OR REPLACE INTO sync_state (name, value) VALUES (?,?)", (state_key, now.strftime(TIME_FMT))
+        )
+        for user_id in revived:
+            self.verified_cache.approve(user_id)
+
+        self.last_run[broker] = {"at": now, "active": len(activity), "scanned": scanned, "updated": len(updates)}
+        logger.info(
+            f"{broker} re-verification: {len(activity)} active accounts, {scanned} submissions scanned, "
+            f"{len(updates)} updated ({len(revived)} reactivated) in {time.perf_counter() - started:.2f}s"
+        )
+        return len(updates)
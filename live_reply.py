@@ -0,0 +1,116 @@
+# live_reply.py — Progressive Telegram message for streamed AI answers
+# Throttled edits | plain-text while streaming, Markdown at the end | 4096-char splitting
+
+import time
+import asyncio
+import logging
+import datetime
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_LIMIT = 4096
+SPLIT_AT = 4000          # thoda margin (cursor / Markdown fallback ke liye)
+CURSOR = " ▌"
+
+class ReplyFailed(Exception):
+    """Final text Markdown aur plain dono tarah edit nahi ho saka (user ko kuch nahi dikha)."""
+
+def split_point(text, limit=SPLIT_AT):
+    """limit se pehle sabse achhi jagah (paragraph > line > space) jahan message toda ja sake."""
+    if len(text) <= limit:
+        return len(text)
+    for sep in ("\n\n", "\n", " "):
+        cut = text.rfind(sep, 0, limit)
+        if cut > limit // 2:
+            return cut + len(sep)
+    return limit
+
+class LiveReply:
+    """
+    Ek "Thinking..." message ko chunks aate-aate edit karta hai.
+
+    - Edits min_interval se zyada tez nahi (Telegram flood limits).
+    - Beech ke edits plain text mein (adhoora Markdown parse error deta hai);
+      final edit Markdown mein, fail ho to plain text.
+    - Text 4096 se bada ho to pehla message final karke naya message shuru.
+    """
+
+    def __init__(self, bot, chat_id, message_id, min_interval=1.2):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self.text = ""          # poora answer (sab messages milakar)
+        self._offset = 0        # self.text mein current message kahan se shuru hota hai
+        self._shown = None      # current message mein abhi kya dikh raha hai
+        self._last_edit = 0.0
+        self.edits = 0
+
+    def reset(self):
+        """Retry se pehle: current message se dobara shuru."""
+        self.text = self.text[:self._offset]
+
+    async def _roll_over(self):
+        """Limit cross ho gayi? Pura hua hissa final karo, baaki naye message mein."""
+        while len(self.text) - self._offset > SPLIT_AT:
+            cut = self._offset + split_point(self.text[self._offset:])
+            await self._finalize(self.text[self._offset:cut])
+            sent = await self.bot.send_message(chat_id=self.chat_id, text="…")
+            self.message_id = sent.message_id
+            self._offset = cut
+            self._shown = None
+
+    async def append(self, chunk):
+        self.text += chunk
+        await self._roll_over()
+        if time.monotonic() - self._last_edit >= self.min_interval:
+            await self._edit(self.text[self._offset:] + CURSOR, parse_mode=None)
+
+    def set_text(self, text):
+        """Stream ke bina poora text (errors / busy messages)."""
+        self.text = self.text[:self._offset] + text
+
+    async def finish(self):
+        if not self.text[self._offset:]:
+            self.text += "⚠️ AI returned an empty answer."
+        # set_text (non-streaming / errors) ka lamba text bhi 4096 se pehle toot kar jaaye
+        await self._roll_over()
+        await self._finalize(self.text[self._offset:])
+
+    async def _finalize(self, text):
+        if await self._edit(text, parse_mode=ParseMode.MARKDOWN, force=True):
+            return
+        if not await self._edit(text, parse_mode=None, force=True):
+            raise ReplyFailed(f"Final edit failed ({len(text)} chars)")
+
+    async def _edit(self, text, parse_mode, force=False):
+        shown = (text, parse_mode)
+        if shown == self._shown:
+            return True
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id, message_id=self.message_id, text=text, parse_mode=parse_mode
+            )
+        except RetryAfter as e:
+            if force:
+                # Final text zaroor pahunchna chahiye — bataya gaya time ruk kar dobara
+                retry = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+                await asyncio.sleep(retry)
+                return await self._edit(text, parse_mode, force=True)
+            # Beech ka edit skip; agla append ya finish dobara try karega
+            logger.debug(f"Live edit throttled by Telegram: {e}")
+            return False
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self._shown = shown
+                return True
+            if parse_mode is None:
+                logger.warning(f"Live edit failed: {e}")
+            return False
+        self._shown = shown
+        self._last_edit = time.monotonic()
+        self.edits += 1
+        return True
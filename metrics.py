@@ -0,0 +1,227 @@
+# metrics.py — Prometheus text-format metrics without extra dependencies
+# Counters / gauges / histograms | .time() decorator + context manager | /metrics rendering
+
+import time
+import bisect
+import logging
+import functools
+import inspect
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds — 5 ms (DB / cache) se 30 s (Gemini vision) tak
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def track(self, **labels):
+        """with GAUGE.track(...): — andar rehne tak gauge +1 (in-flight requests)."""
+        return _Tracker(self, labels)
+
+class _Tracker:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge, labels):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+        return self
+
+    def __exit__(self, *exc):
+        self.gauge.dec(**self.labels)
+        return False
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [har bucket ka count (cumulative nahi), sum, total count]
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def time(self, **labels):
+        """Decorator (sync / async function) ya context manager: duration seconds mein observe."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for key, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        histogram, labels = self.histogram, self.labels
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, **labels)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+
+class CallbackMetric(_Metric):
+    """
+    Scrape ke waqt fn() se value: pehle se bane stats() dicts (cache hits, queue size)
+    bina hot path chhue export ho jate hain. fn number ya {label-values tuple: number} de.
+    """
+
+    def __init__(self, name, help_text, fn, kind="gauge", labels=()):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            logger.debug(f"Metric {self.name} collect failed: {e}")
+            return []
+        self._values = value if isinstance(value, dict) else {(): value}
+        return super().render()
+
+def render():
+    """Poora registry Prometheus text exposition format mein."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ---------------- HOT PATH METRICS ----------------
+BROKER_VERIFY_SECONDS = Histogram("broker_verify_seconds", "Broker account verification latency", ("broker",))
+BROKER_IN_FLIGHT = Gauge("broker_requests_in_flight", "Broker HTTP requests currently running", ("broker",))
+VERIFICATIONS = Counter("verifications_total", "Client ID verification attempts", ("broker", "result"))
+APPROVALS = Counter("approvals_total", "Approved submissions", ("broker",))
+GEMINI_SECONDS = Histogram("gemini_request_seconds", "Gemini call latency (full answer)", ("mode",))
+AI_ERRORS = Counter("ai_errors_total", "Failed Gemini calls", ("kind",))
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "SQLite query latency (writes include queue wait)", ("op",))
+TELEGRAM_API_SECONDS = Histogram("telegram_api_seconds", "Telegram Bot API call latency", ("endpoint",))
+
+# ---------------- STARTUP ----------------
+STARTUP_SECONDS = Gauge("startup_phase_seconds", "Cold start duration per phase", ("phase",))
+
+class StartupTimer:
+    """
+    Cold start ka hisaab (Render free tier restarts): mark(phase) pichhle mark se ab tak ka
+    time log karta hai aur startup_phase_seconds mein rakhta hai. first_update() pehle
+    answered update pe — process start se user ko jawab tak ka total.
+    """
+
+    def __init__(self, started=None):
+        self.started = self.last = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.first_update_after = None
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = now - self.last
+        self.last = now
+        STARTUP_SECONDS.set(self.phases[phase], phase=phase)
+        logger.info(f"Startup: {phase} took {self.phases[phase] * 1000:.0f} ms (t+{now - self.started:.2f}s)")
+
+    def first_update(self):
+        if self.first_update_after is not None:
+            return
+        self.first_update_after = time.perf_counter() - self.started
+        STARTUP_SECONDS.set(self.first_update_after, phase="first_update_total")
+        logger.info(f"Startup: first update answered {self.first_update_after:.2f}s after process start")
@@ -0,0 +1,231 @@
+# outbox.py — One outbound dispatcher for every Telegram Bot API call
+# PTB BaseRateLimiter | token buckets (global + per chat) | edit coalescing | automatic RetryAfter
+
+import time
+import asyncio
+import logging
+import datetime
+from collections import Counter
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import TELEGRAM_API_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Telegram ki documented limits: ~30 msg/sec total, private chat ~1/sec, group ~20/min
+GLOBAL_RATE = 30.0
+PRIVATE_RATE = 1.0
+PRIVATE_BURST = 3
+GROUP_RATE = 20 / 60
+GROUP_BURST = 5
+
+# Sirf ye endpoints chat ke andar "messages" gine jaate hain (ban / getFile / answerCallbackQuery nahi)
+CHAT_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+# "send" se shuru par message nahi — typing indicator chat ka 3-message burst na khaye
+UNCOUNTED_ENDPOINTS = {"sendChatAction"}
+COALESCED_ENDPOINTS = {"editMessageText", "editMessageCaption", "editMessageReplyMarkup"}
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now):
+        """Agla token kitni der mein milega (0 = abhi)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause_time(self, now):
+        """Sirf RetryAfter pause — token nahi ginta (ban, sendChatAction jaise calls)."""
+        return max(0.0, self.paused_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now):
+        return now >= self.paused_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class _PendingEdit:
+    __slots__ = ("args", "future", "merged")
+
+    def __init__(self, args, future):
+        self.args = args
+        self.future = future
+        self.merged = 0   # kitne callers is edit pe wait kar rahe hain (owner ke alawa)
+
+def _retry_seconds(error):
+    value = error.retry_after
+    return value.total_seconds() if isinstance(value, datetime.timedelta) else float(value)
+
+class OutboundDispatcher(BaseRateLimiter):
+    """
+    Application.builder().rate_limiter(...) se lagta hai, isliye har handler ka
+    har Bot API call (reply_text, edit_message_text, send_chat_action, ...) yahin se guzarta hai.
+
+    - Global + per-chat token buckets (flood limits se neeche).
+    - Same message ke pending edits merge: queue mein sirf latest text rehta hai,
+      sab callers ko wahi result milta hai. Pehla caller (owner) cancel ho jaye to bhi
+      merged callers ka edit jaata hai.
+    - RetryAfter aaye to sirf usi chat ka bucket rukta hai (ban / invite link jaise non-message
+      calls ka bhi) — ek channel ka flood baaki chats ko block nahi karta. Global bucket sirf
+      bina chat wale calls (answerCallbackQuery, setMyCommands) ke 429 pe rukta hai.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, max_retries=3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._pending_edits = {}
+        self._tasks = set()
+        self.waiting = 0
+        self.in_flight = 0
+        self.sent = Counter()
+        self.coalesced = 0
+        self.retries = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    # ---------------- BUCKETS ----------------
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._prune()
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(PRIVATE_RATE, PRIVATE_BURST) if private else TokenBucket(GROUP_RATE, GROUP_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for chat_id in [c for c, b in self._chat_buckets.items() if b.idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    async def _acquire(self, chat_bucket, counted=True):
+        """counted=False: chat ka pause maano, par uska message token mat lo."""
+        self.waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                wait = self.global_bucket.wait_time(now)
+                if chat_bucket is not None:
+                    wait = max(wait, chat_bucket.wait_time(now) if counted else chat_bucket.pause_time(now))
+                if wait <= 0:
+                    self.global_bucket.take()
+                    if chat_bucket is not None and counted:
+                        chat_bucket.take()
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self.waiting -= 1
+
+    # ---------------- DISPATCH ----------------
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        # Chat wale har call ka bucket (RetryAfter pause ke liye); token sirf messages lete hain
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+        counted = endpoint.startswith(CHAT_LIMITED_PREFIXES) and endpoint not in UNCOUNTED_ENDPOINTS
+
+        if endpoint not in COALESCED_ENDPOINTS:
+            await self._acquire(chat_bucket, counted)
+            return await self._send(callback, args, kwargs, endpoint, chat_bucket, counted)
+
+        key = (endpoint, chat_id, data.get("message_id"), data.get("inline_message_id"))
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            # Isi message ka edit pehle se queue mein hai — uska text latest se badal do
+            pending.args = args
+            pending.merged += 1
+            self.coalesced += 1
+            return await asyncio.shield(pending.future)
+
+        pending = _PendingEdit(args, asyncio.get_running_loop().create_future())
+        self._pending_edits[key] = pending
+        try:
+            await self._acquire(chat_bucket)
+        except asyncio.CancelledError:
+            if not pending.merged:
+                del self._pending_edits[key]
+                pending.future.cancel()
+                raise
+            # Owner cancel hua, par merged callers ka (latest) text abhi bhi jaana chahiye —
+            # token background mein lo, shared future cancel nahi
+            self._spawn(self._deliver(key, pending, callback, kwargs, endpoint, chat_bucket, acquired=False))
+            raise
+        # Token mil gaya: bhejna task mein, taaki owner cancel ho to bhi merged callers ko result mile
+        self._spawn(self._deliver(key, pending, callback, kwargs, endpoint, chat_bucket))
+        return await asyncio.shield(pending.future)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, key, pending, callback, kwargs, endpoint, chat_bucket, acquired=True):
+        """Token lo (agar nahi liya), pending edit queue se hatao aur latest args ke saath bhejo."""
+        try:
+            if not acquired:
+                await self._acquire(chat_bucket)
+        except BaseException:
+            pending.future.cancel()
+            raise
+        finally:
+            # Token mil gaya (ya chhod diya): ab aane wale edits naya pending banayenge
+            if self._pending_edits.get(key) is pending:
+                del self._pending_edits[key]
+        try:
+            pending.future.set_result(await self._send(callback, pending.args, kwargs, endpoint, chat_bucket))
+        except Exception as e:
+            pending.future.set_exception(e)
+        except BaseException:
+            pending.future.cancel()   # shutdown pe task cancel
+            raise
+
+    async def _send(self, callback, args, kwargs, endpoint, chat_bucket, counted=True):
+        attempt = 0
+        while True:
+            self.in_flight += 1
+            try:
+                with TELEGRAM_API_SECONDS.time(endpoint=endpoint):
+                    result = await callback(*args, **kwargs)
+                self.sent[endpoint] += 1
+                return result
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                delay = _retry_seconds(e)
+                bucket = chat_bucket or self.global_bucket
+                bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay)
+                logger.warning(f"Telegram flood limit on {endpoint}, retry {attempt} in {delay:.0f}s")
+            finally:
+                self.in_flight -= 1
+            await self._acquire(chat_bucket, counted)
+
+    def stats(self):
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "pending_edits": len(self._pending_edits),
+            "sent": sum(self.sent.values()),
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "chats_tracked": len(self._chat_buckets),
+        }
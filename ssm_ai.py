@@ -1,17 +1,25 @@
 import os
-import google.generativeai as genai
+import time
+import asyncio
+import logging
+import datetime
+
+from ai_cache import ResponseCache
+from metrics import GEMINI_SECONDS, AI_ERRORS
+
+logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
 # Render environment variables se API Key lega
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Model Setup
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    # Using the latest Flash model for speed and vision capabilities
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
-else:
-    model = None
+# Using the latest Flash model for speed and vision capabilities
+MODEL_NAME = os.getenv("GEMINI_MODEL", 'gemini-2.0-flash-exp')
+# "1" = bible ko Gemini context cache mein rakho (model + minimum token size support chahiye)
+AI_CONTEXT_CACHE = os.getenv("AI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=6)
+# "1" = startup ke baad background mein SDK import + model build (pehle user ko ye wait na ho)
+AI_PREWARM = os.getenv("AI_PREWARM", "1") == "1"
 
 # --- SHAAKUNI ULTIMATE BIBLE (STRATEGY KNOWLEDGE BASE) ---
 SSM_BIBLE = """
@@ -115,36 +123,225 @@ YOUR TASK:
    - **Action:** (Give advice in USER'S LANGUAGE)
 """
 
-async def analyze_ssm_request(user_text, image_bytes=None):
+# --- MODEL SETUP ---
+# Bible/system prompt model ke saath ek hi baar register hota hai, har request ke
+# contents mein dobara paste nahi hota:
+#   - default: system_instruction
+#   - AI_CONTEXT_CACHE=1: Gemini context cache — bible tokens server pe cached rehte hain
+#     aur har call pe poore price pe dobara process nahi hote. Fail ho to system_instruction.
+# google.generativeai ka import hi ~1 s (cold disk pe zyada) — isliye pehli zaroorat pe, process start pe nahi.
+model = None
+_model_expires = None  # context cache expiry (time.monotonic); system_instruction model ke liye None
+_model_lock = asyncio.Lock()
+
+def _build_model():
+    import google.generativeai as genai
+    from google.generativeai import caching
+    genai.configure(api_key=GOOGLE_API_KEY)
+    if AI_CONTEXT_CACHE:
+        try:
+            cache = caching.CachedContent.create(
+                model=MODEL_NAME,
+                display_name="ssm-bible",
+                system_instruction=SYSTEM_PROMPT,
+                ttl=CONTEXT_CACHE_TTL,
+            )
+            logger.info(f"SSM bible registered as context cache {cache.name}")
+            # Expiry se 5 min pehle naya cache bana lenge
+            expires = time.monotonic() + CONTEXT_CACHE_TTL.total_seconds() - 300
+            return genai.GenerativeModel.from_cached_content(cache), expires
+        except Exception as e:
+            logger.warning(f"Context cache unavailable, using system_instruction: {e}")
+    return genai.GenerativeModel(MODEL_NAME, system_instruction=SYSTEM_PROMPT), None
+
+async def get_model():
+    """Model pehli call pe banta hai; context cache expire ho to refresh hota hai."""
+    global model, _model_expires
+    if model is not None and (_model_expires is None or time.monotonic() < _model_expires):
+        return model
+    if not GOOGLE_API_KEY:
+        return model
+    async with _model_lock:
+        if model is None or (_model_expires is not None and time.monotonic() >= _model_expires):
+            # CachedContent.create network call hai — event loop block na ho
+            model, _model_expires = await asyncio.to_thread(_build_model)
+    return model
+
+async def prewarm(context=None):
+    """JobQueue callback (AI_PREWARM): model abhi bana lo. Fail ho to pehli request dobara try karegi."""
+    if model is not None or not GOOGLE_API_KEY:
+        return
+    started = time.perf_counter()
+    try:
+        await get_model()
+    except Exception as e:
+        logger.warning(f"Gemini prewarm failed, will retry on first request: {e!r}")
+        return
+    logger.info(f"Gemini model prewarmed in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def set_model(new_model):
+    """Model badalne ke liye (benchmarks / fake model ke saath offline testing)."""
+    global model, _model_expires
+    model, _model_expires = new_model, None
+
+# --- TOKEN ACCOUNTING ---
+usage_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "latency_ms": 0.0}
+
+def record_usage(mode, response, latency_ms):
     """
-    Main function called by bot.py to interact with Google Gemini API.
+    Har successful Gemini call ke prompt / output tokens aur latency log + total karo.
+    GEMINI_SECONDS yahan nahi — call site pe observe hota hai taaki errors / timeouts bhi gine jayein.
     """
-    # 1. Check for API Key
-    if not GOOGLE_API_KEY:
-        return "❌ Error: Google API Key is missing. Please add GOOGLE_API_KEY in Render Environment Variables."
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    usage_stats["requests"] += 1
+    usage_stats["prompt_tokens"] += prompt_tokens
+    usage_stats["cached_tokens"] += cached_tokens
+    usage_stats["output_tokens"] += output_tokens
+    usage_stats["latency_ms"] += latency_ms
+    logger.info(
+        f"Gemini {mode}: prompt={prompt_tokens} (cached={cached_tokens}) output={output_tokens} tokens, {latency_ms:.0f} ms"
+    )
+
+# --- ERRORS ---
+class AIBusyError(Exception):
+    """Gemini quota / overload (429, 503) — retry karne layak error."""
+
+_busy_errors = None
+
+def busy_errors():
+    """Retry layak google.api_core exceptions — except clause error aane pe hi isse padhta hai (lazy import)."""
+    global _busy_errors
+    if _busy_errors is None:
+        from google.api_core import exceptions as google_exceptions
+        _busy_errors = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+                        google_exceptions.ServiceUnavailable)
+    return _busy_errors
+
+# --- RESPONSE CACHE ---
+# Same chart / same sawaal dobara aaye to Gemini call (aur tokens) bachao
+response_cache = ResponseCache()
+
+async def _prepare_request(user_text, image_bytes, mime_type):
+    """
+    Model + contents tayyar karta hai.
+    Returns (model, contents, mode) ya setup error ho to (None, error_message, None).
+    """
+    # 1. Check for API Key (fake model ke saath key ki zaroorat nahi)
+    if not GOOGLE_API_KEY and model is None:
+        return None, "❌ Error: Google API Key is missing. Please add GOOGLE_API_KEY in Render Environment Variables.", None
 
     # 2. Check for Model Initialization
-    if not model:
-        return "❌ Error: AI Model failed to initialize. Please check your API Key."
+    try:
+        ai_model = await get_model()
+    except Exception as e:
+        logger.error(f"Model init failed: {e!r}")
+        ai_model = None
+    if not ai_model:
+        return None, "❌ Error: AI Model failed to initialize. Please check your API Key.", None
+
+    # 3. Request contents (Image or Text) — system prompt model mein already hai
+    if image_bytes:
+        # CHART ANALYSIS MODE (Vision)
+        # Gemini expects image parts in this format
+        image_parts = [{"mime_type": mime_type, "data": image_bytes}]
+        prompt_parts = [
+            f"User Chart Caption: {user_text or 'Analyze this setup strictly'}.",
+            image_parts[0]
+        ]
+        return ai_model, prompt_parts, "vision"
+    # TEXT MODE (Q&A)
+    return ai_model, [f"Student Question: {user_text}"], "text"
+
+async def _cache_answer(cache_key, text):
+    try:
+        await response_cache.put(cache_key, text)
+    except Exception as e:
+        logger.warning(f"AI cache write failed: {e!r}")
+
+async def analyze_ssm_request(user_text, image_bytes=None, mime_type="image/jpeg", check_cache=True):
+    """
+    Main function called by bot.py to interact with Google Gemini API.
+    mime_type: image ka asli type (chart_images.prepare_chart detect karta hai).
+    check_cache=False: caller (bot.py, scheduler se pehle) cache dekh chuka hai — answer phir bhi cache hota hai.
+    Quota / overload errors AIBusyError ban kar raise hote hain (scheduler retry karega);
+    baaki errors pehle ki tarah message string mein return hote hain.
+    """
+    # Cache check (same question / same chart) — model init / API key se pehle, hit pe Gemini ki zaroorat hi nahi
+    cache_key = await response_cache.make_key(user_text, image_bytes)
+    cached = await response_cache.get(cache_key) if check_cache else None
+    if cached is not None:
+        return cached
+
+    ai_model, contents, mode = await _prepare_request(user_text, image_bytes, mime_type)
+    if ai_model is None:
+        return contents
 
     try:
-        # 3. Process Request (Image or Text)
-        if image_bytes:
-            # CHART ANALYSIS MODE (Vision)
-            # Gemini expects image parts in this format
-            image_parts = [{"mime_type": "image/jpeg", "data": image_bytes}]
-            
-            prompt_parts = [
-                SYSTEM_PROMPT, 
-                f"User Chart Caption: {user_text or 'Analyze this setup strictly'}.", 
-                image_parts[0]
-            ]
-            response = await model.generate_content_async(prompt_parts)
-        else:
-            # TEXT MODE (Q&A)
-            response = await model.generate_content_async([SYSTEM_PROMPT, f"Student Question: {user_text}"])
-            
-        return response.text
+        started = time.perf_counter()
+        with GEMINI_SECONDS.time(mode=mode):
+            response = await ai_model.generate_content_async(contents)
+        record_usage(mode, response, (time.perf_counter() - started) * 1000)
+        text = response.text
+        await _cache_answer(cache_key, text)
+        return text
         
+    except busy_errors() as e:
+        AI_ERRORS.inc(kind="busy")
+        raise AIBusyError(str(e)) from e
     except Exception as e:
+        AI_ERRORS.inc(kind="error")
         return f"⚠️ AI Error: {str(e)}"
+
+async def stream_ssm_request(user_text, image_bytes=None, mime_type="image/jpeg", check_cache=True):
+    """
+    analyze_ssm_request ka streaming version: answer ke text chunks yield karta hai.
+    Cached answer ek hi chunk mein aata hai. Errors bhi chunk ki tarah ("⚠️ AI Error ...").
+    AIBusyError sirf pehla chunk aane se pehle raise hota hai (tab retry safe hai).
+    """
+    cache_key = await response_cache.make_key(user_text, image_bytes)
+    cached = await response_cache.get(cache_key) if check_cache else None
+    if cached is not None:
+        yield cached
+        return
+
+    ai_model, contents, mode = await _prepare_request(user_text, image_bytes, mime_type)
+    if ai_model is None:
+        yield contents
+        return
+
+    parts = []
+    started = time.perf_counter()
+    try:
+        response = await ai_model.generate_content_async(contents, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:  # safety-blocked / khaali chunk
+                continue
+            if not text:
+                continue
+            if not parts:
+                logger.info(f"Gemini {mode} first token in {(time.perf_counter() - started) * 1000:.0f} ms")
+            parts.append(text)
+            yield text
+    except busy_errors() as e:
+        AI_ERRORS.inc(kind="busy")
+        if not parts:
+            raise AIBusyError(str(e)) from e
+        yield f"\n\n⚠️ AI Error: {str(e)}"
+        return
+    except Exception as e:
+        AI_ERRORS.inc(kind="error")
+        prefix = "\n\n" if parts else ""
+        yield f"{prefix}⚠️ AI Error: {str(e)}"
+        return
+    finally:
+        # Success, error, timeout ya consumer ka beech mein band karna — har case mein latency record
+        GEMINI_SECONDS.observe(time.perf_counter() - started, mode=mode)
+
+    record_usage(mode, response, (time.perf_counter() - started) * 1000)
+    if parts:
+        await _cache_answer(cache_key, "".join(parts))
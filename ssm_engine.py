@@ -0,0 +1,383 @@
+# ssm_engine.py — Deterministic SSM pattern detector for OHLC candle files
+# NumPy vectorized sweeps / inside-outside bars / FVG / SCOB | leg-level IDM, BOS vs fake BOS, CHoCH
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+OHLC_MAX_BYTES = int(os.getenv("OHLC_MAX_BYTES", str(5 * 1024 * 1024)))
+OHLC_MIN_CANDLES = 20
+REPORT_EVENTS = 8        # reply / Gemini context mein kitne recent structure events
+REPORT_ZONES = 3         # kitne fresh FVG / SCOB zones
+TIME_COLUMNS = ("time", "date", "datetime", "timestamp", "gmt time", "local time", "open time")
+PRICE_COLUMNS = {"open": ("open", "o"), "high": ("high", "h"), "low": ("low", "l"), "close": ("close", "c")}
+
+# CPU kaam event loop se bahar (chart_images jaisa)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ssm-engine")
+
+# ---------------- CSV ----------------
+class Candles:
+    """OHLC arrays + candle index → time label (time text sirf report ke waqt nikalte hain)."""
+
+    def __init__(self, o, h, l, c, rows=None, delimiter=",", time_cols=()):
+        self.open, self.high, self.low, self.close = o, h, l, c
+        self._rows = rows
+        self._delimiter = delimiter
+        self._time_cols = time_cols
+
+    def __len__(self):
+        return len(self.close)
+
+    def label(self, index):
+        if not self._rows or not self._time_cols:
+            return f"#{index + 1}"
+        parts = self._rows[index].split(self._delimiter)
+        return " ".join(parts[i].strip() for i in self._time_cols if i < len(parts))
+
+def _sniff_delimiter(line):
+    return max((",", ";", "\t"), key=line.count)
+
+def _header_columns(fields):
+    names = [f.strip().strip("<>").strip().lower() for f in fields]
+    columns = {}
+    for key, aliases in PRICE_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[key] = names.index(alias)
+                break
+    if len(columns) < 4:
+        return None, ()
+    # MT4/MT5 export: DATE aur TIME alag columns
+    time_cols = tuple(i for i, name in enumerate(names) if name in TIME_COLUMNS)
+    return columns, time_cols
+
+def parse_ohlc_csv(data):
+    """
+    CSV bytes → Candles (purani candle pehle). Header (time,open,high,low,close[,volume]) ho ya MT4
+    jaisa bina header (date,time,o,h,l,c,v). Galat / adhuri file pe ValueError (message user ko dikhta hai).
+    """
+    if len(data) > OHLC_MAX_BYTES:
+        raise ValueError(f"File too large (max {OHLC_MAX_BYTES // (1024 * 1024)} MB)")
+    text = data.decode("utf-8-sig", errors="replace")
+    rows = [row for row in text.splitlines() if row.strip()]
+    if not rows:
+        raise ValueError("File is empty")
+    delimiter = _sniff_delimiter(rows[0])
+    columns, time_cols = _header_columns(rows[0].split(delimiter))
+    if columns:
+        rows = rows[1:]
+    else:
+        # Bina header: aakhri 4-5 numeric columns OHLC(+volume), baaki time
+        width = len(rows[0].split(delimiter))
+        if width < 4:
+            raise ValueError("Not enough columns for OHLC data")
+        first = {4: 0, 5: 1, 6: 1}.get(width, 2)
+        columns = dict(zip(("open", "high", "low", "close"), range(first, first + 4)))
+        time_cols = tuple(range(first))
+    usecols = tuple(columns[key] for key in ("open", "high", "low", "close"))
+    try:
+        ohlc = np.loadtxt(rows, delimiter=delimiter, usecols=usecols, dtype=np.float64, ndmin=2)
+    except ValueError as e:
+        raise ValueError(f"Could not read prices: {e}") from e
+    if len(ohlc) < OHLC_MIN_CANDLES:
+        raise ValueError(f"Need at least {OHLC_MIN_CANDLES} candles, got {len(ohlc)}")
+    o, h, l, c = (np.ascontiguousarray(ohlc[:, i]) for i in range(4))
+    bad = np.flatnonzero((h < np.maximum(o, c)) | (l > np.minimum(o, c)) | ~np.isfinite(ohlc).all(axis=1))
+    if len(bad):
+        raise ValueError(f"Row {bad[0] + 1}: high/low do not contain open/close")
+    return Candles(o, h, l, c, rows, delimiter, time_cols)
+
+# ---------------- CANDLE RULES (vectorized) ----------------
+def reference_candles(h, l):
+    """
+    §1.1 Rule A: inside bar ignore hota hai — har candle apne 'mother' (pichhla non-inside candle)
+    se compare hoti hai. Returns (ref index array, inside mask).
+    Pichhli candle ke andar wali candle mother ke andar bhi hai (vectorized pass); sirf inside
+    chains ke aage wali candles ko mother se compare karna padta hai — loop sirf un chains pe.
+    """
+    n = len(h)
+    inside = np.zeros(n, dtype=bool)
+    inside[1:] = (h[1:] <= h[:-1]) & (l[1:] >= l[:-1])
+    chain_starts = np.flatnonzero(inside[1:] & ~inside[:-1]) + 1
+    if len(chain_starts):
+        highs, lows, contained = h.tolist(), l.tolist(), inside.tolist()
+        covered = 0
+        for start in chain_starts.tolist():
+            if start < covered:
+                continue  # pichhli chain mein hi aa gaya
+            top, bottom = highs[start - 1], lows[start - 1]
+            i = start
+            while i < n and (contained[i] or (highs[i] <= top and lows[i] >= bottom)):
+                contained[i] = True
+                i += 1
+            covered = i
+        inside = np.array(contained, dtype=bool)
+    last = np.maximum.accumulate(np.where(inside, -1, np.arange(n)))
+    ref = np.zeros(n, dtype=np.int64)
+    ref[1:] = last[:-1]
+    return ref, inside
+
+def detect_candles(candles):
+    """Per-candle boolean masks + SCOB entries. Sab kuch ek-do NumPy passes mein."""
+    o, h, l, c = candles.open, candles.high, candles.low, candles.close
+    n = len(c)
+    ref, inside = reference_candles(h, l)
+    ref_high, ref_low = h[ref], l[ref]
+    breaks_high = ~inside & (h > ref_high)
+    breaks_low = ~inside & (l < ref_low)
+    breaks_high[0] = breaks_low[0] = False
+    outside = breaks_high & breaks_low
+    # Sweep: liquidity li (wick bahar) aur body wapas mother range ke andar band hui
+    sweep_high = breaks_high & (c < ref_high)
+    sweep_low = breaks_low & (c > ref_low)
+
+    # FVG (§3.1 Imbalance): candle i-1 aur i+1 ke beech gap; baad mein price wapas aaya to mitigated
+    bull_fvg = np.zeros(n, dtype=bool)
+    bear_fvg = np.zeros(n, dtype=bool)
+    bull_fvg[1:-1] = l[2:] > h[:-2]
+    bear_fvg[1:-1] = h[2:] < l[:-2]
+    future_low = np.minimum.accumulate(l[::-1])[::-1]    # min(low[j:])
+    future_high = np.maximum.accumulate(h[::-1])[::-1]
+    after = np.full(n, np.inf)
+    after[:-2] = future_low[2:]
+    bull_open = bull_fvg & (after > np.roll(l, -1))
+    after[:] = -np.inf
+    after[:-2] = future_high[2:]
+    bear_open = bear_fvg & (after < np.roll(h, -1))
+
+    # SCOB (§4.1): lambi wick wala sweep, agli candle sweep candle ki body tod de
+    body_top, body_bottom = np.maximum(o, c), np.minimum(o, c)
+    body = body_top - body_bottom
+    scob_bull = np.zeros(n, dtype=bool)
+    scob_bear = np.zeros(n, dtype=bool)
+    scob_bull[1:] = (sweep_low & (body_bottom - l >= body))[:-1] & (c[1:] > body_top[:-1])
+    scob_bear[1:] = (sweep_high & (h - body_top >= body))[:-1] & (c[1:] < body_bottom[:-1])
+
+    return {
+        "ref": ref, "inside": inside, "outside": outside,
+        "breaks_high": breaks_high, "breaks_low": breaks_low,
+        "sweep_high": sweep_high, "sweep_low": sweep_low,
+        "bull_fvg": bull_fvg, "bear_fvg": bear_fvg, "bull_fvg_open": bull_open, "bear_fvg_open": bear_open,
+        "scob_bull": scob_bull, "scob_bear": scob_bear,
+    }
+
+# ---------------- STRUCTURE (legs → IDM / BOS / CHoCH) ----------------
+def find_legs(masks):
+    """
+    Non-inside candles ko direction do (+1 high toda, -1 low toda). Outside bar (§1.1 Rule B) dono
+    todta hai — pichhli direction ke ulta, yaani pullback. Same direction ki lagatar candles = ek leg.
+    Returns (leg start indices, leg directions).
+    """
+    direction = masks["breaks_high"].astype(np.int8) - masks["breaks_low"].astype(np.int8)
+    candidates = np.flatnonzero(~masks["inside"] & (masks["breaks_high"] | masks["breaks_low"]))
+    if not len(candidates):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+    dirs = direction[candidates]
+    outside = masks["outside"][candidates]
+    # Outside bars: pichhli non-outside direction ka ulta (forward fill; shuru mein ho to pullback of up)
+    known = np.maximum.accumulate(np.where(outside, -1, np.arange(len(dirs))))
+    previous = np.where(known >= 0, dirs[np.maximum(known, 0)], 1)
+    dirs = np.where(outside, -previous, dirs)
+    starts = np.flatnonzero(np.diff(dirs, prepend=0) != 0)
+    return candidates[starts], dirs[starts]
+
+def locate(event):
+    """Event ki exact candle: leg ke andar pehli candle jo level paar kare (sirf report hone wale events ke liye)."""
+    kind, side, price, start, end, values = event
+    window = values[start:end]
+    crossed = window > price if (kind == "IDM") == (side < 0) else window < price
+    return start + int(np.argmax(crossed)) if crossed.any() else end - 1
+
+def detect_structure(candles, masks):
+    """
+    SSM Bible ka structure logic (bullish likha hai; bearish = prices negate karke wahi rules):
+      High bana → usse pehle wala pullback low IDM hai. Pullback IDM le le → High confirmed.
+      Confirmed High ke upar body close → BOS. IDM liye bina High toot gaya → FAKE BOS
+      (High aage khisakta hai, IDM naya pullback low). Confirmation ke baad pullback ka low
+      protected hai — uske neeche body close → CHoCH, trend palat jaata hai.
+    Loop legs pe hai (candles pe nahi); leg extremes reduceat se ek saath. Events
+    (kind, side, price, leg start, leg end, series) — exact candle locate() se.
+    """
+    h, l, c = candles.high, candles.low, candles.close
+    starts, dirs = find_legs(masks)
+    events = []
+    if len(starts) < 2:
+        return events, 0
+    # Loop mein numpy scalars dheeme hain — plain Python lists
+    leg_high = np.maximum.reduceat(h, starts).tolist()
+    leg_low = np.minimum.reduceat(l, starts).tolist()
+    leg_max_close = np.maximum.reduceat(c, starts).tolist()
+    leg_min_close = np.minimum.reduceat(c, starts).tolist()
+    ends = np.append(starts[1:], len(c)).tolist()
+    dirs, starts = dirs.tolist(), starts.tolist()
+
+    trend = dirs[0]
+    level = None          # current High (signed: bearish mein -price)
+    idm = None            # us High se pehle ka pullback low (signed)
+    confirmed = False
+    protected = None
+    last_pullback = None  # latest opposite leg ka extreme (signed) — agle High ka IDM
+    last_push = None      # latest with-trend leg ka top — CHoCH ke baad naye trend ka IDM
+
+    for k, direction in enumerate(dirs):
+        s = trend
+        if s > 0:
+            top, bottom, close_top, close_bottom = leg_high[k], leg_low[k], leg_max_close[k], leg_min_close[k]
+        else:
+            top, bottom, close_top, close_bottom = -leg_low[k], -leg_high[k], -leg_min_close[k], -leg_max_close[k]
+        if level is None:
+            level, idm = top, bottom   # pehla leg: jahan se High bana wahi pehla IDM
+            continue
+
+        if confirmed and close_bottom < protected:
+            # CHoCH: protected low ke neeche body close → trend flip
+            events.append(("CHOCH", -s, s * protected, starts[k], ends[k], c))
+            trend = -s
+            idm = -(last_push if last_push is not None else level)
+            level = -bottom
+            confirmed, protected, last_push, last_pullback = False, None, None, None
+            continue
+
+        if direction != s:
+            if not confirmed and idm is not None and bottom < idm:
+                events.append(("IDM", s, s * idm, starts[k], ends[k], l if s > 0 else h))
+                confirmed, protected = True, bottom   # baad ki wicks isse nahi hilaati, sirf close
+            last_pullback = bottom
+            continue
+
+        last_push = top
+        if top <= level:
+            continue
+        if close_top > level:
+            if confirmed:
+                events.append(("BOS", s, s * level, starts[k], ends[k], c))
+            elif idm is not None:
+                events.append(("FAKE_BOS", s, s * level, starts[k], ends[k], c))
+        elif confirmed:
+            continue  # sirf wick — confirmed High ka sweep, level wahi
+        if last_pullback is not None:
+            idm = last_pullback
+        level, confirmed, protected, last_pullback = top, False, None, None
+    return events, trend
+
+# ---------------- ANALYSIS ----------------
+def _zones(candles, masks, limit=REPORT_ZONES):
+    h, l, o, c = candles.high, candles.low, candles.open, candles.close
+    fvgs = []
+    for i in np.flatnonzero(masks["bull_fvg_open"])[-limit:]:
+        fvgs.append((int(i), "bullish", float(h[i - 1]), float(l[i + 1])))
+    for i in np.flatnonzero(masks["bear_fvg_open"])[-limit:]:
+        fvgs.append((int(i), "bearish", float(h[i + 1]), float(l[i - 1])))
+    fvgs.sort()
+    scobs = []
+    for i in np.flatnonzero(masks["scob_bull"])[-limit:]:
+        sweep = i - 1
+        wick_top = min(o[sweep], c[sweep])
+        scobs.append((int(i), "bullish", float((l[sweep] + wick_top) / 2), float(l[sweep])))
+    for i in np.flatnonzero(masks["scob_bear"])[-limit:]:
+        sweep = i - 1
+        wick_bottom = max(o[sweep], c[sweep])
+        scobs.append((int(i), "bearish", float((h[sweep] + wick_bottom) / 2), float(h[sweep])))
+    scobs.sort()
+    return fvgs[-limit:], scobs[-limit:]
+
+def analyze_candles(candles):
+    """Candles → findings dict (counts, trend, recent events, fresh zones)."""
+    started = time.perf_counter()
+    masks = detect_candles(candles)
+    events, trend = detect_structure(candles, masks)
+    fvgs, scobs = _zones(candles, masks)
+    kinds = [event[0] for event in events]
+    recent = [(locate(event), event[0], "bullish" if event[1] > 0 else "bearish", event[2])
+              for event in events[-REPORT_EVENTS:]]
+    label = candles.label
+    return {
+        "candles": len(candles),
+        "first": label(0),
+        "last": label(len(candles) - 1),
+        "last_close": float(candles.close[-1]),
+        "trend": {1: "bullish", -1: "bearish"}.get(trend, "unclear"),
+        "counts": {
+            "sweeps": int(masks["sweep_high"].sum() + masks["sweep_low"].sum()),
+            "inside_bars": int(masks["inside"].sum()),
+            "outside_bars": int(masks["outside"].sum()),
+            "fvg": int(masks["bull_fvg"].sum() + masks["bear_fvg"].sum()),
+            "fvg_open": int(masks["bull_fvg_open"].sum() + masks["bear_fvg_open"].sum()),
+            "scob": int(masks["scob_bull"].sum() + masks["scob_bear"].sum()),
+            "idm": kinds.count("IDM"),
+            "bos": kinds.count("BOS"),
+            "fake_bos": kinds.count("FAKE_BOS"),
+            "choch": kinds.count("CHOCH"),
+        },
+        "events": [(label(i), kind, side, price) for i, kind, side, price in recent],
+        "fvgs": [(label(i), side, bottom, top) for i, side, bottom, top in fvgs],
+        "scobs": [(label(i), side, entry, stop) for i, side, entry, stop in scobs],
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+def analyze_csv(data):
+    """Sync: CSV bytes → findings. Galat file pe ValueError."""
+    return analyze_candles(parse_ohlc_csv(data))
+
+async def analyze_upload(data):
+    loop = asyncio.get_running_loop()
+    findings = await loop.run_in_executor(_executor, analyze_csv, data)
+    logger.info(f"SSM engine: {findings['candles']} candles analyzed in {findings['elapsed_ms']:.1f} ms")
+    return findings
+
+# ---------------- OUTPUT ----------------
+def _price(value):
+    return f"{value:.5f}".rstrip("0").rstrip(".")
+
+EVENT_NAMES = {"IDM": "IDM taken", "BOS": "BOS", "FAKE_BOS": "Fake BOS (no IDM)", "CHOCH": "CHoCH"}
+
+def format_findings(findings):
+    """User ke liye Markdown reply (Gemini ke bina)."""
+    counts = findings["counts"]
+    trend_icon = {"bullish": "🟢", "bearish": "🔴"}.get(findings["trend"], "⚪")
+    lines = [
+        "📊 **SSM Structure Scan**",
+        f"{findings['candles']} candles | {findings['first']} → {findings['last']}",
+        f"{trend_icon} Trend: **{findings['trend'].title()}** | Last close: `{_price(findings['last_close'])}`",
+        "",
+        f"🔁 Sweeps: {counts['sweeps']} | Inside: {counts['inside_bars']} | Outside: {counts['outside_bars']}",
+        f"🧱 BOS: {counts['bos']} | ⚠️ Fake BOS: {counts['fake_bos']} | IDM: {counts['idm']} | CHoCH: {counts['choch']}",
+        f"🕳 FVG: {counts['fvg']} ({counts['fvg_open']} unmitigated) | 🎯 SCOB: {counts['scob']}",
+    ]
+    if findings["events"]:
+        lines += ["", "**Recent structure:**"]
+        lines += [f"• {when} — {EVENT_NAMES[kind]} {side} @ `{_price(price)}`" for when, kind, side, price in findings["events"]]
+    if findings["fvgs"]:
+        lines += ["", "**Fresh FVGs:**"]
+        lines += [f"• {when} — {side} `{_price(bottom)}` – `{_price(top)}`" for when, side, bottom, top in findings["fvgs"]]
+    if findings["scobs"]:
+        lines += ["", "**SCOB entries (50% of wick):**"]
+        lines += [f"• {when} — {side} entry `{_price(entry)}`, SL `{_price(stop)}`" for when, side, entry, stop in findings["scobs"]]
+    lines += ["", "_Add a caption to your CSV to get Shaakuni AI's reading of these levels._"]
+    return "\n".join(lines)
+
+def compact_context(findings):
+    """Gemini prompt ke liye chhota plain-text block — poori CSV nahi bhejni padti."""
+    counts = findings["counts"]
+    parts = [
+        f"[Candle data scan: {findings['candles']} candles {findings['first']} to {findings['last']}, "
+        f"last close {_price(findings['last_close'])}, trend {findings['trend']}]",
+        "Counts: " + ", ".join(f"{key}={value}" for key, value in counts.items()),
+    ]
+    if findings["events"]:
+        parts.append("Structure: " + "; ".join(
+            f"{when} {EVENT_NAMES[kind]} {side} @{_price(price)}" for when, kind, side, price in findings["events"]))
+    if findings["fvgs"]:
+        parts.append("Unmitigated FVGs: " + "; ".join(
+            f"{when} {side} {_price(bottom)}-{_price(top)}" for when, side, bottom, top in findings["fvgs"]))
+    if findings["scobs"]:
+        parts.append("SCOB: " + "; ".join(
+            f"{when} {side} entry {_price(entry)} SL {_price(stop)}" for when, side, entry, stop in findings["scobs"]))
+    return "\n".join(parts)
@@ -0,0 +1,133 @@
+# stats.py — Materialized counters for the admin dashboard
+# SQLite triggers keep totals / per-broker / per-day numbers current in the same transaction as every write
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "Verified" = kam se kam ek 'approved' submission wala distinct user (dashboard ki purani COUNT(*) rows ginti thi)
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        name TEXT,
+        broker TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, broker)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS stats_daily (
+        day TEXT,
+        name TEXT,
+        broker TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, name, broker)
+    ) WITHOUT ROWID;
+    -- Har user ke approved submissions; row hai = user verified hai
+    CREATE TABLE IF NOT EXISTS stats_verified (
+        tg_user_id INTEGER PRIMARY KEY,
+        approved INTEGER NOT NULL
+    );
+
+    -- users
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users BEGIN
+        INSERT INTO stats_totals (name, broker, value) VALUES ('users', '', 1)
+            ON CONFLICT (name, broker) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_daily (day, name, broker, value) VALUES (date(COALESCE(NEW.joined_at, CURRENT_TIMESTAMP)), 'new_users', '', 1)
+            ON CONFLICT (day, name, broker) DO UPDATE SET value = value + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users BEGIN
+        UPDATE stats_totals SET value = value - 1 WHERE name = 'users' AND broker = '';
+    END;
+
+    -- submissions: approved rows aate / jaate / status badalte waqt (same-value UPDATE pe kuch nahi)
+    CREATE TRIGGER IF NOT EXISTS trg_stats_submissions_insert AFTER INSERT ON submissions WHEN NEW.status = 'approved' BEGIN
+        INSERT INTO stats_totals (name, broker, value) VALUES ('approved', NEW.broker, 1)
+            ON CONFLICT (name, broker) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_daily (day, name, broker, value) VALUES (date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), 'approvals', NEW.broker, 1)
+            ON CONFLICT (day, name, broker) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_verified (tg_user_id, approved) VALUES (NEW.tg_user_id, 1)
+            ON CONFLICT (tg_user_id) DO UPDATE SET approved = approved + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_submissions_delete AFTER DELETE ON submissions WHEN OLD.status = 'approved' BEGIN
+        UPDATE stats_totals SET value = value - 1 WHERE name = 'approved' AND broker = OLD.broker;
+        UPDATE stats_verified SET approved = approved - 1 WHERE tg_user_id = OLD.tg_user_id;
+        DELETE FROM stats_verified WHERE tg_user_id = OLD.tg_user_id AND approved <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_submissions_unapprove AFTER UPDATE OF status, broker, tg_user_id ON submissions
+    WHEN OLD.status = 'approved' AND (NEW.status IS NOT OLD.status OR NEW.broker IS NOT OLD.broker OR NEW.tg_user_id IS NOT OLD.tg_user_id) BEGIN
+        UPDATE stats_totals SET value = value - 1 WHERE name = 'approved' AND broker = OLD.broker;
+        UPDATE stats_verified SET approved = approved - 1 WHERE tg_user_id = OLD.tg_user_id;
+        DELETE FROM stats_verified WHERE tg_user_id = OLD.tg_user_id AND approved <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_submissions_approve AFTER UPDATE OF status, broker, tg_user_id ON submissions
+    WHEN NEW.status = 'approved' AND (NEW.status IS NOT OLD.status OR NEW.broker IS NOT OLD.broker OR NEW.tg_user_id IS NOT OLD.tg_user_id) BEGIN
+        INSERT INTO stats_totals (name, broker, value) VALUES ('approved', NEW.broker, 1)
+            ON CONFLICT (name, broker) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_verified (tg_user_id, approved) VALUES (NEW.tg_user_id, 1)
+            ON CONFLICT (tg_user_id) DO UPDATE SET approved = approved + 1;
+    END;
+
+    -- stats_verified se distinct verified users ka counter
+    CREATE TRIGGER IF NOT EXISTS trg_stats_verified_insert AFTER INSERT ON stats_verified BEGIN
+        INSERT INTO stats_totals (name, broker, value) VALUES ('verified_users', '', 1)
+            ON CONFLICT (name, broker) DO UPDATE SET value = value + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_verified_delete AFTER DELETE ON stats_verified BEGIN
+        UPDATE stats_totals SET value = value - 1 WHERE name = 'verified_users' AND broker = '';
+    END;
+"""
+
+# Purane data se counters dobara banana (pehli baar / drift ho to). Order zaroori hai:
+# stats_verified ke triggers verified_users badhate hain, isliye totals baad mein overwrite.
+REBUILD = [
+    ("DELETE FROM stats_verified", ()),
+    ("DELETE FROM stats_totals", ()),
+    ("DELETE FROM stats_daily", ()),
+    ("INSERT INTO stats_verified (tg_user_id, approved) "
+     "SELECT tg_user_id, COUNT(*) FROM submissions WHERE status = 'approved' GROUP BY tg_user_id", ()),
+    ("INSERT OR REPLACE INTO stats_totals (name, broker, value) SELECT 'users', '', COUNT(*) FROM users", ()),
+    ("INSERT OR REPLACE INTO stats_totals (name, broker, value) SELECT 'verified_users', '', COUNT(*) FROM stats_verified", ()),
+    ("INSERT OR REPLACE INTO stats_totals (name, broker, value) "
+     "SELECT 'approved', broker, COUNT(*) FROM submissions WHERE status = 'approved' GROUP BY broker", ()),
+    ("INSERT INTO stats_daily (day, name, broker, value) "
+     "SELECT date(joined_at), 'new_users', '', COUNT(*) FROM users GROUP BY date(joined_at)", ()),
+    ("INSERT INTO stats_daily (day, name, broker, value) "
+     "SELECT date(created_at), 'approvals', broker, COUNT(*) FROM submissions WHERE status = 'approved' "
+     "GROUP BY date(created_at), broker", ()),
+    ("INSERT OR REPLACE INTO stats_totals (name, broker, value) VALUES ('_built', '', 1)", ()),
+]
+
+async def attach(db):
+    """Schema + triggers banao; pehli baar existing rows se counters bhar do."""
+    await db.executescript(SCHEMA)
+    if not await db.fetchval("SELECT value FROM stats_totals WHERE name = '_built' AND broker = ''"):
+        await rebuild(db)
+
+async def rebuild(db):
+    """Poora recount — ek transaction mein, baaki writes ke beech (write queue serialize karti hai)."""
+    await db.transaction(REBUILD)
+    logger.info("Dashboard stats rebuilt from users / submissions")
+
+async def read_totals(db):
+    """Dashboard numbers: sirf primary-key lookups, table size se farak nahi padta."""
+    totals = {"users": 0, "verified_users": 0, "approved": {}}
+    for name, broker, value in await db.fetchall(
+        "SELECT name, broker, value FROM stats_totals WHERE name IN ('users', 'verified_users', 'approved')"
+    ):
+        if name == "approved":
+            totals["approved"][broker] = value
+        else:
+            totals[name] = value
+    return totals
+
+async def read_daily(db, days=14):
+    """Pichhle `days` din: {day: {"new_users": n, "approvals": {broker: n}}}, naye din pehle."""
+    timeline = {}
+    for day, name, broker, value in await db.fetchall(
+        "SELECT day, name, broker, value FROM stats_daily WHERE day >= date('now', ?) ORDER BY day DESC",
+        (f"-{days - 1} days",),
+    ):
+        entry = timeline.setdefault(day, {"new_users": 0, "approvals": {}})
+        if name == "approvals":
+            entry["approvals"][broker] = value
+        else:
+            entry[name] = value
+    return timeline
@@ -0,0 +1,190 @@
+# vip_links.py — Pre-generated pool of one-time VIP invite links
+# Background refill | atomic local pop (same DB transaction as the approval) | scheduled revoke of stale / unused links
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from telegram.error import BadRequest, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+VIP_POOL_SIZE = int(os.getenv("VIP_POOL_SIZE", "20"))
+VIP_LINK_TTL = int(os.getenv("VIP_LINK_TTL", str(3 * 24 * 3600)))   # Telegram expire_date (seconds)
+VIP_LINK_MIN_LEFT = 24 * 3600       # isse kam validity bachi ho to link user ko nahi dete, rotate karte hain
+# Issued link itni der baad revoke (use hua ho ya nahi) — user ko message mein yahi validity batate hain.
+# MIN_LEFT se bada nahi ho sakta, warna Telegram expiry pehle aa jayegi.
+VIP_LINK_ISSUED_GRACE = VIP_LINK_MIN_LEFT
+VIP_POOL_MAINTAIN_INTERVAL = 1800   # revoke + refill job
+VIP_LINK_KEEP_DAYS = 30             # issued / revoked rows kitne din history mein rahein
+LINK_NAME = "Maharaja Secure Verification"
+
+# Purana vip_links (broker PRIMARY KEY, invite_link) kabhi use nahi hua — naya schema uski jagah
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS vip_links (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        invite_link TEXT UNIQUE NOT NULL,
+        status TEXT NOT NULL DEFAULT 'available',   -- available | issued | revoked
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        issued_to INTEGER,
+        issued_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_vip_links_status ON vip_links (status, expires_at);
+"""
+
+class InviteLinkPool:
+    """
+    member_limit=1 links pehle se bana kar vip_links mein rakhta hai. Approval ke waqt
+    pop() memory se link deta hai (koi Telegram call nahi) aur "issued" mark karne wala
+    statement lautata hai — caller use approval ke transaction mein daalta hai, taaki
+    link aur submission ek saath commit hon.
+    """
+
+    def __init__(self, db, channel_id, size=VIP_POOL_SIZE, ttl=VIP_LINK_TTL):
+        self.db = db
+        self.channel_id = channel_id
+        self.size = size
+        self.ttl = ttl
+        self.bot = None
+        self.issued = 0
+        self.fallbacks = 0
+        self._available = deque()   # (id, invite_link, expires_at) — purane pehle
+        self._refill_lock = asyncio.Lock()
+        self._tasks = set()
+
+    @property
+    def enabled(self):
+        return bool(self.channel_id) and self.bot is not None
+
+    async def attach(self, bot):
+        """Startup: schema (purane table ka migration), available links memory mein."""
+        await self._migrate()
+        await self.db.executescript(SCHEMA)
+        self.bot = bot
+        rows = await self.db.fetchall(
+            "SELECT id, invite_link, expires_at FROM vip_links WHERE status='available' AND expires_at > ? ORDER BY id",
+            (time.time() + VIP_LINK_MIN_LEFT,),
+        )
+        self._available = deque(tuple(row) for row in rows)
+        logger.info(f"VIP link pool loaded: {len(self._available)} available")
+
+    async def _migrate(self):
+        columns = [row[1] for row in await self.db.fetchall("PRAGMA table_info(vip_links)")]
+        if columns and "status" not in columns:
+            if await self.db.fetchval("SELECT COUNT(*) FROM vip_links"):
+                await self.db.executescript("ALTER TABLE vip_links RENAME TO vip_links_legacy;")
+            else:
+                await self.db.executescript("DROP TABLE vip_links;")
+            logger.info("vip_links migrated to the invite pool schema")
+
+    # ---------------- ISSUE ----------------
+    def pop(self, user_id):
+        """
+        (invite_link, mark_issued_statement) ya pool khaali ho to (None, None).
+        Sync function — asyncio mein do users ko same link nahi mil sakta.
+        """
+        if not self.channel_id:
+            return None, None
+        cutoff = time.time() + VIP_LINK_MIN_LEFT
+        while self._available:
+            link_id, link, expires_at = self._available.popleft()
+            if expires_at <= cutoff:
+                continue  # rotate job revoke kar dega
+            self.issued += 1
+            self._schedule_refill()
+            return link, (
+                "UPDATE vip_links SET status='issued', issued_to=?, issued_at=? WHERE id=? AND status='available'",
+                (user_id, time.time(), link_id),
+            )
+        self.fallbacks += 1
+        self._schedule_refill()
+        return None, None
+
+    def _schedule_refill(self):
+        if not self.enabled or self._refill_lock.locked() or len(self._available) > self.size // 2:
+            return
+        task = asyncio.create_task(self.refill())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ---------------- REFILL / ROTATE ----------------
+    async def refill(self):
+        """Pool ko size tak bharo. Ek waqt mein ek hi refill."""
+        if not self.enabled or self._refill_lock.locked():
+            return 0
+        created = 0
+        async with self._refill_lock:
+            while len(self._available) < self.size:
+                now = time.time()
+                try:
+                    invite = await self.bot.create_chat_invite_link(
+                        chat_id=self.channel_id, member_limit=1, name=LINK_NAME, expire_date=int(now + self.ttl),
+                    )
+                except TelegramError as e:
+                    logger.warning(f"VIP link pool refill stopped: {e}")
+                    break
+                await self.db.execute(
+                    "INSERT INTO vip_links (invite_link, status, created_at, expires_at) VALUES (?, 'available', ?, ?)",
+                    (invite.invite_link, now, now + self.ttl),
+                )
+                # execute() sirf rowcount deta hai — id UNIQUE link se
+                link_id = await self.db.fetchval("SELECT id FROM vip_links WHERE invite_link=?", (invite.invite_link,))
+                self._available.append((link_id, invite.invite_link, now + self.ttl))
+                created += 1
+        if created:
+            logger.info(f"VIP link pool: +{created} links ({len(self._available)} available)")
+        return created
+
+    async def revoke_stale(self):
+        """
+        Telegram pe revoke: available links jo jaldi expire honge, aur issued links jo
+        VIP_LINK_ISSUED_GRACE se purane hain (unused link kisi aur ke haath na lage; use ho
+        chuka link revoke karne se member nahi nikalta). Purani history saaf.
+        """
+        if not self.enabled:
+            return 0
+        now = time.time()
+        stale = await self.db.fetchall(
+            "SELECT id, invite_link, expires_at FROM vip_links "
+            "WHERE (status='available' AND expires_at <= ?) OR (status='issued' AND issued_at <= ?)",
+            (now + VIP_LINK_MIN_LEFT, now - VIP_LINK_ISSUED_GRACE),
+        )
+        stale_ids = {row[0] for row in stale}
+        self._available = deque(item for item in self._available if item[0] not in stale_ids)
+        revoked = []
+        for link_id, link, expires_at in stale:
+            if expires_at <= now:
+                revoked.append(("revoked", link_id))  # Telegram pe already expired — API call nahi
+                continue
+            try:
+                await self.bot.revoke_chat_invite_link(chat_id=self.channel_id, invite_link=link)
+            except BadRequest as e:
+                logger.debug(f"VIP link already gone ({link}): {e}")  # expired / pehle se revoked
+            except TelegramError as e:
+                logger.warning(f"VIP link revoke failed, will retry: {e}")
+                continue
+            revoked.append(("revoked", link_id))
+        if revoked:
+            await self.db.executemany("UPDATE vip_links SET status=? WHERE id=?", revoked)
+        await self.db.execute(
+            "DELETE FROM vip_links WHERE status != 'available' AND created_at < ?",
+            (time.time() - VIP_LINK_KEEP_DAYS * 86400,),
+        )
+        return len(revoked)
+
+    async def maintain(self, context=None):
+        """JobQueue callback: stale links revoke, phir pool refill."""
+        try:
+            revoked = await self.revoke_stale()
+            if revoked:
+                logger.info(f"VIP link pool: revoked {revoked} stale links")
+            await self.refill()
+        except Exception as e:
+            logger.warning(f"VIP link pool maintenance failed: {e!r}")
+
+    def stats(self):
+        return {"available": len(self._available), "issued": self.issued, "fallbacks": self.fallbacks}
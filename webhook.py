@@ -0,0 +1,171 @@
+# webhook.py — Single-process webhook mode
+# One tornado server on the bot's own event loop (Telegram updates + /health) | per-user ordered concurrent updates
+
+import os
+import hmac
+import json
+import signal
+import asyncio
+import hashlib
+import logging
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---------------- CONFIGURATION ----------------
+# WEBHOOK_URL set ho (jaise https://maharaja-bot.onrender.com) to webhook mode, warna polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = "/" + os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))  # ek saath kitne updates process hon
+
+def webhook_secret(bot_token):
+    """Telegram har request ke header mein ye bhejta hai. Env na ho to token se stable secret."""
+    return WEBHOOK_SECRET or hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()[:32]
+
+# ---------------- UPDATE ORDERING ----------------
+def _ordering_key(update):
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Alag users ke updates parallel chalte hain, par ek user ke updates aane ke
+    order mein ek-ek karke — ConversationHandler ka state isi par tikka hai.
+    User lock semaphore se pehle lete hain, taaki ek user ke 20 messages
+    baaki users ke slots na gher lein. on_first_update: pehla update poora hone pe ek baar
+    (cold start timing).
+    """
+
+    def __init__(self, max_concurrent_updates=UPDATE_CONCURRENCY, on_first_update=None):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+        self._holders = {}
+        self._on_first_update = on_first_update
+
+    async def process_update(self, update, coroutine):
+        key = _ordering_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                # Koi aur update wait nahi kar raha — lock hata do (memory na badhe)
+                del self._holders[key]
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+        if self._on_first_update is not None:
+            callback, self._on_first_update = self._on_first_update, None
+            callback()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+# ---------------- HTTP HANDLERS ----------------
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write("Bot is alive!")
+
+    def head(self):
+        self.set_status(200)
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", metrics.CONTENT_TYPE)
+        self.write(metrics.render())
+
+class TelegramUpdateHandler(tornado.web.RequestHandler):
+    def initialize(self, ptb_app, secret):
+        self.ptb_app = ptb_app
+        self.secret = secret
+
+    async def post(self):
+        token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token, self.secret):
+            self.set_status(403)
+            return
+        try:
+            update = Update.de_json(json.loads(self.request.body), self.ptb_app.bot)
+        except Exception as e:
+            logger.warning(f"Bad webhook payload: {e}")
+            self.set_status(400)
+            return
+        # Queue mein daal kar turant 200 — processing PTB ke update fetcher mein
+        await self.ptb_app.update_queue.put(update)
+        self.set_status(200)
+
+    def log_exception(self, typ, value, tb):
+        logger.error("Webhook handler error", exc_info=(typ, value, tb))
+
+def make_web_app(ptb_app, secret):
+    return tornado.web.Application(
+        [
+            (r"/", HealthHandler),
+            (r"/health", HealthHandler),
+            (r"/metrics", MetricsHandler),
+            (WEBHOOK_PATH, TelegramUpdateHandler, {"ptb_app": ptb_app, "secret": secret}),
+        ],
+        log_function=lambda handler: None,  # har update ka access log nahi chahiye
+    )
+
+# ---------------- RUN ----------------
+async def run_webhook(app, port, bot_token):
+    """
+    run_polling() ki jagah: PTB lifecycle khud chalata hai (post_init / post_shutdown
+    bhi) aur isi event loop par ek HTTP server — koi alag health thread nahi.
+    """
+    secret = webhook_secret(bot_token)
+    server = HTTPServer(make_web_app(app, secret), xheaders=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        server.listen(port, "0.0.0.0")
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL + WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=min(100, max(UPDATE_CONCURRENCY, 40)),
+        )
+        logger.info(f"Webhook mode: listening on :{port}, updates at {WEBHOOK_PATH}")
+        await stop.wait()
+    finally:
+        server.stop()
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)